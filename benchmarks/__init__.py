@@ -0,0 +1,7 @@
+"""
+GreenLens benchmark suite.
+
+Times every stage of the detection pipeline on synthetic images, with a randomly
+initialised model when no trained weights are present, and compares the results
+against a stored baseline. Run with ``python -m benchmarks.run``.
+"""
@@ -0,0 +1,193 @@
+"""
+Synthetic inputs and stand-ins for the benchmark suite: deterministic leaf-like
+images, a classifier that falls back to random weights, stubbed external services
+and a minimal in-process ASGI client for driving the FastAPI app.
+"""
+
+import asyncio
+import io
+import uuid
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Resolutions the image stages are timed at: a web upload, a desktop photo and a phone camera
+RESOLUTIONS = {
+    'vga': (640, 480),
+    '1080p': (1920, 1080),
+    '12mp': (4000, 3000),
+}
+
+SAMPLE_WEATHER = {
+    'location': 'New York',
+    'country': 'United States of America',
+    'temperature': 24.0,
+    'humidity': 85,
+    'condition': 'Light rain',
+    'wind_speed': 11.2,
+    'pressure': 1012.0,
+    'visibility': 10.0,
+    'uv_index': 4.0,
+    'last_updated': '2024-06-01 12:00'
+}
+
+SAMPLE_REMEDY = (
+    "Remove and destroy infected leaves, improve air circulation around the plants and "
+    "apply a copper-based fungicide every 7-10 days while humid weather persists."
+)
+
+
+def synthetic_image(width, height, seed=0):
+    """A deterministic leaf-like RGB image
+
+    Smooth green shading with blotches and fine texture, so JPEG sizes and decode
+    costs resemble real field photos rather than flat colour or pure noise.
+    """
+    rng = np.random.default_rng(seed)
+    blotches = Image.fromarray((rng.random((12, 16)) * 255).astype(np.uint8)).resize((width, height), Image.BICUBIC)
+    blotches = np.asarray(blotches, dtype=np.float32) / 255.0
+
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = 60 + 110 * blotches
+    pixels[..., 1] = 150 - 40 * blotches
+    pixels[..., 2] = 50 + 20 * blotches
+    pixels += rng.normal(0, 8, size=(height, width, 1)).astype(np.float32)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def jpeg_bytes(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def write_image_files(directory, resolutions=RESOLUTIONS):
+    """Write one synthetic JPEG per resolution; returns {label: path}"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for seed, (label, (width, height)) in enumerate(resolutions.items()):
+        path = directory / f"synthetic_{label}.jpg"
+        path.write_bytes(jpeg_bytes(synthetic_image(width, height, seed=seed)))
+        paths[label] = str(path)
+    return paths
+
+
+def load_classifier():
+    """A DiseaseClassifier, with seeded random weights when the trained model is absent
+
+    Returns ``(classifier, random_weights)``. Timings with random weights are
+    representative; predictions are not.
+    """
+    import torch
+    from config import MODEL_PATH, MODEL_MMAP_PATH
+    from models.disease_classifier import DiseaseClassifier
+
+    class BenchmarkClassifier(DiseaseClassifier):
+        random_weights = False
+
+        def load_model(self):
+            if Path(MODEL_PATH).exists() or Path(MODEL_MMAP_PATH).exists():
+                return super().load_model()
+            print(f"⚠️  No model at {MODEL_PATH}, benchmarking a randomly initialised one")
+            torch.manual_seed(0)
+            self.model = self.build_architecture().to(self.device)
+            self.model.eval()
+            self.random_weights = True
+
+    classifier = BenchmarkClassifier()
+    return classifier, classifier.random_weights
+
+
+def stub_services():
+    """Weather, remedy and speech services that answer instantly without network access
+
+    Weather keeps the real ``assess_disease_risk`` so its cost stays in the measurement.
+    """
+    from services.weather_service import WeatherService
+
+    class StubWeatherService(WeatherService):
+        def get_weather_data(self, location):
+            return dict(SAMPLE_WEATHER, location=location)
+
+    class StubGeminiService:
+        def generate_disease_remedy(self, disease_name, weather_info=None):
+            return f"{disease_name}: {SAMPLE_REMEDY}"
+
+        @staticmethod
+        def is_fallback_remedy(remedy_text):
+            return False
+
+    class StubTTSService:
+        def create_comprehensive_audio(self, disease_name, remedy_text, risk_assessment, language='english'):
+            return None
+
+    return {
+        'weather': StubWeatherService,
+        'gemini': StubGeminiService,
+        'tts': StubTTSService,
+    }
+
+
+def multipart_body(fields, files):
+    """Encode form fields and ``{name: (filename, content, content_type)}`` files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+        )
+    for name, (filename, content, content_type) in files.items():
+        header = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        parts.append(header.encode('utf-8') + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+async def asgi_request(app, method, path, body=b'', content_type=None):
+    """Send one HTTP request straight into an ASGI app; returns ``(status, body)``"""
+    headers = [(b'content-length', str(len(body)).encode('latin-1'))]
+    if content_type:
+        headers.append((b'content-type', content_type.encode('latin-1')))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('latin-1'),
+        'query_string': b'',
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('benchmark', 80),
+    }
+    response = {'status': None, 'body': []}
+    complete = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # Only a disconnect is left to report, once the response is out
+        await complete.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+            if not message.get('more_body', False):
+                complete.set()
+
+    await app(scope, receive, send)
+    complete.set()
+    return response['status'], b''.join(response['body'])
@@ -0,0 +1,178 @@
+"""
+Timing, summary statistics and baseline comparison for the benchmark suite.
+"""
+
+import asyncio
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.memory import peak_rss_mb, reset_peak_rss
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(name, timings, items_per_call=1, wall_time=None, peak_rss=None, params=None):
+    """Latency percentiles (ms) and throughput (items/s) for a list of call durations in seconds"""
+    latencies = np.asarray(timings, dtype=np.float64) * 1000.0
+    elapsed = wall_time if wall_time is not None else float(np.sum(timings))
+    result = {
+        'name': name,
+        'params': params or {},
+        'iterations': len(timings),
+        'items_per_call': items_per_call,
+        'latency_ms': {
+            'mean': round(float(latencies.mean()), 3),
+            'min': round(float(latencies.min()), 3),
+            'max': round(float(latencies.max()), 3),
+        },
+        'throughput_per_s': round(items_per_call * len(timings) / elapsed, 3) if elapsed > 0 else None,
+        'peak_rss_mb': peak_rss,
+    }
+    for percentile in PERCENTILES:
+        result['latency_ms'][f'p{percentile}'] = round(float(np.percentile(latencies, percentile)), 3)
+    return result
+
+
+def measure(name, fn, iterations=20, warmup=3, items_per_call=1, params=None):
+    """Time ``fn()`` over ``iterations`` calls after ``warmup`` untimed ones"""
+    for _ in range(warmup):
+        fn()
+
+    reset_peak_rss()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    result = summarize(name, timings, items_per_call, peak_rss=peak_rss_mb(), params=params)
+    print_result(result)
+    return result
+
+
+async def measure_async(name, call, iterations=20, warmup=2, concurrency=1, params=None):
+    """Time ``await call(i)`` for ``iterations`` distinct i, ``concurrency`` calls in flight at once
+
+    Latency is per call; throughput is calls per second of wall time.
+    """
+    for i in range(warmup):
+        await call(-1 - i)
+
+    reset_peak_rss()
+    timings = []
+
+    async def timed(i):
+        started = time.perf_counter()
+        await call(i)
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for first in range(0, iterations, concurrency):
+        await asyncio.gather(*(timed(i) for i in range(first, min(first + concurrency, iterations))))
+    wall_time = time.perf_counter() - started
+
+    result = summarize(
+        name, timings, wall_time=wall_time, peak_rss=peak_rss_mb(),
+        params=dict(params or {}, concurrency=concurrency)
+    )
+    print_result(result)
+    return result
+
+
+def print_result(result):
+    latency = result['latency_ms']
+    throughput = result['throughput_per_s']
+    print(f"⏱️  {result['name']:<40} p50 {latency['p50']:>9.2f} ms  p95 {latency['p95']:>9.2f} ms  "
+          f"p99 {latency['p99']:>9.2f} ms  {throughput or 0:>9.1f}/s  peak RSS {result['peak_rss_mb']} MB")
+
+
+def host_info():
+    """What the numbers were measured on; comparisons across different hosts are only indicative"""
+    info = {
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'platform': platform.platform(),
+        'python': sys.version.split()[0],
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def build_report(results, random_weights):
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'host': host_info(),
+        'random_weights': random_weights,
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=0.15, rss_tolerance_mb=32):
+    """Compare a report with a baseline report, benchmark by benchmark
+
+    A benchmark regresses when its p50 latency is more than ``threshold`` slower,
+    its throughput more than ``threshold`` lower, or its peak RSS both more than
+    ``threshold`` and more than ``rss_tolerance_mb`` higher than in the baseline.
+    Returns a list of rows with a status of ok, improved, regression or new.
+    """
+    baseline_results = {result['name']: result for result in baseline.get('results', [])}
+    rows = []
+    for result in report['results']:
+        base = baseline_results.get(result['name'])
+        row = {'name': result['name'], 'status': 'new', 'reasons': []}
+        rows.append(row)
+        if base is None:
+            continue
+
+        latency_change = _change(result['latency_ms']['p50'], base['latency_ms']['p50'])
+        throughput_change = _change(result['throughput_per_s'], base['throughput_per_s'])
+        rss_change = _change(result['peak_rss_mb'], base['peak_rss_mb'])
+        row.update(latency_change=latency_change, throughput_change=throughput_change, rss_change=rss_change)
+
+        if latency_change is not None and latency_change > threshold:
+            row['reasons'].append(f"p50 latency +{latency_change:.0%}")
+        if throughput_change is not None and throughput_change < -threshold:
+            row['reasons'].append(f"throughput {throughput_change:.0%}")
+        if (rss_change is not None and rss_change > threshold
+                and result['peak_rss_mb'] - base['peak_rss_mb'] > rss_tolerance_mb):
+            row['reasons'].append(f"peak RSS +{rss_change:.0%}")
+
+        if row['reasons']:
+            row['status'] = 'regression'
+        elif latency_change is not None and latency_change < -threshold:
+            row['status'] = 'improved'
+        else:
+            row['status'] = 'ok'
+    return rows
+
+
+def _change(value, base):
+    if value is None or not base:
+        return None
+    return value / base - 1.0
+
+
+def print_comparison(rows, report, baseline):
+    if baseline.get('host') != report['host']:
+        print("⚠️  Baseline was recorded on a different host or runtime; differences are only indicative")
+    if baseline.get('random_weights') != report['random_weights']:
+        print("⚠️  Baseline and this run differ in trained vs random weights")
+
+    icons = {'ok': '✅', 'improved': '🚀', 'regression': '❌', 'new': '🆕'}
+    for row in rows:
+        change = row.get('latency_change')
+        detail = f"p50 {change:+.0%}" if change is not None else ""
+        if row['reasons']:
+            detail = ", ".join(row['reasons'])
+        print(f"{icons[row['status']]} {row['name']:<40} {row['status']:<10} {detail}")
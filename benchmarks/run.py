@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+GreenLens Benchmark Runner
+Times each pipeline stage and the end-to-end detection handler, reports latency
+percentiles, throughput and peak RSS, and flags regressions against a baseline.
+
+Example:
+    python -m benchmarks.run --save-baseline            # record benchmarks/baseline.json
+    python -m benchmarks.run --suite predict --suite e2e  # compare against it (exit 1 on regression)
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Keep the end-to-end run in this process and free of tuning noise; set before config is imported.
+# With INFERENCE_WORKERS > 0 the worker processes need the trained model on disk.
+os.environ.setdefault("INFERENCE_WORKERS", "0")
+os.environ.setdefault("AUTOTUNE", "False")
+os.environ.setdefault("PREFORK", "False")
+os.environ.setdefault("SAVE_UPLOADS", "False")
+
+from benchmarks.harness import build_report, compare, print_comparison
+from benchmarks.suites import SUITES, BenchmarkContext
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def run(suites, iterations, warmup, quick):
+    ctx = BenchmarkContext(iterations=iterations, warmup=warmup, quick=quick)
+    results = []
+    try:
+        for name in suites:
+            print(f"📊 Running {name} benchmarks...")
+            results.extend(SUITES[name](ctx))
+    finally:
+        ctx.close()
+    return build_report(results, ctx.random_weights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GreenLens detection pipeline")
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES),
+                        help="Suite to run (repeatable; default: all)")
+    parser.add_argument('--iterations', type=int, help="Timed iterations per benchmark (default 20, 5 with --quick)")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed iterations before each benchmark")
+    parser.add_argument('--quick', action='store_true', help="Fewer iterations and batch sizes, for a smoke run")
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Relative change that counts as a regression (default 0.15)")
+    args = parser.parse_args()
+
+    iterations = args.iterations or (5 if args.quick else 20)
+    suites = args.suite or list(SUITES)
+    report = run(suites, iterations, args.warmup, args.quick)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"ℹ️  No baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, threshold=args.threshold)
+    print_comparison(rows, report, baseline)
+
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) regressed beyond {args.threshold:.0%}")
+        return 1
+    print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
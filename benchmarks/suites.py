@@ -0,0 +1,205 @@
+"""
+Benchmarks for each pipeline stage. Every suite takes a BenchmarkContext and
+returns a list of result dicts from the harness.
+"""
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+from benchmarks.fixtures import (
+    RESOLUTIONS, SAMPLE_WEATHER, asgi_request, jpeg_bytes, load_classifier, multipart_body,
+    stub_services, synthetic_image, write_image_files
+)
+from benchmarks.harness import measure, measure_async
+
+BATCH_SIZES = (1, 4, 8, 16)
+
+
+class BenchmarkContext:
+    """Model, fixtures and iteration counts shared by the suites"""
+
+    def __init__(self, iterations=20, warmup=3, quick=False):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.quick = quick
+        self.batch_sizes = BATCH_SIZES[:2] if quick else BATCH_SIZES
+        self.workdir = tempfile.TemporaryDirectory(prefix="greenlens-bench-")
+        self.image_paths = write_image_files(Path(self.workdir.name) / "images")
+        self._classifier = None
+        self._gradcam = None
+        self.random_weights = None
+
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            self._classifier, self.random_weights = load_classifier()
+        return self._classifier
+
+    @property
+    def gradcam(self):
+        if self._gradcam is None:
+            from models.gradcam import GradCAM
+            self._gradcam = GradCAM(self.classifier.model, model_lock=self.classifier.model_lock)
+        return self._gradcam
+
+    def model_inputs(self, count):
+        """``count`` preprocessed tensors of distinct synthetic images"""
+        return [
+            self.classifier.preprocess_image(synthetic_image(640, 480, seed=100 + i))[0]
+            for i in range(count)
+        ]
+
+    def close(self):
+        self.workdir.cleanup()
+
+
+def bench_preprocess(ctx):
+    """Decode + resize + normalise a JPEG file into a model input"""
+    return [
+        measure(f"preprocess_image[{label}]", lambda path=path: ctx.classifier.preprocess_image(path),
+                iterations=ctx.iterations, warmup=ctx.warmup, params={'resolution': label})
+        for label, path in ctx.image_paths.items()
+    ]
+
+
+def bench_predict(ctx):
+    """Single-image predict from a file, and forward-only predict_batch across batch sizes"""
+    results = [
+        measure("predict[1080p]", lambda: ctx.classifier.predict(ctx.image_paths['1080p']),
+                iterations=ctx.iterations, warmup=ctx.warmup, params={'resolution': '1080p'})
+    ]
+    for batch_size in ctx.batch_sizes:
+        inputs = ctx.model_inputs(batch_size)
+        results.append(measure(
+            f"predict_batch[{batch_size}]", lambda inputs=inputs: ctx.classifier.predict_batch(inputs),
+            iterations=ctx.iterations, warmup=ctx.warmup, items_per_call=batch_size,
+            params={'batch_size': batch_size, 'engine': ctx.classifier.engine.name,
+                    'precision': ctx.classifier.precision}
+        ))
+    return results
+
+
+def bench_gradcam(ctx):
+    """Grad-CAM for one image, and fused top-k explanations across batch sizes"""
+    from config import GRADCAM_TOP_K
+
+    image_tensor = ctx.model_inputs(1)[0]
+    results = [
+        measure("gradcam.generate_cam", lambda: ctx.gradcam.generate_cam(image_tensor),
+                iterations=ctx.iterations, warmup=ctx.warmup)
+    ]
+    for batch_size in ctx.batch_sizes:
+        inputs = ctx.model_inputs(batch_size)
+        results.append(measure(
+            f"explain_batch[{batch_size}x top{GRADCAM_TOP_K}]",
+            lambda inputs=inputs: ctx.classifier.explain_batch(inputs, ctx.gradcam, top_k=GRADCAM_TOP_K),
+            iterations=ctx.iterations, warmup=ctx.warmup, items_per_call=batch_size,
+            params={'batch_size': batch_size, 'top_k': GRADCAM_TOP_K}
+        ))
+    return results
+
+
+def bench_overlay(ctx):
+    """Render and encode a heatmap overlay onto JPEG files of each resolution"""
+    image_tensor = ctx.model_inputs(1)[0]
+    cam = ctx.gradcam.generate_cam(image_tensor)
+    output_dir = Path(ctx.workdir.name) / "overlays"
+    output_dir.mkdir(exist_ok=True)
+
+    results = []
+    for label, path in ctx.image_paths.items():
+        output_path = str(output_dir / f"overlay_{label}.jpg")
+        results.append(measure(
+            f"overlay_heatmap[{label}]",
+            lambda path=path, output_path=output_path: ctx.gradcam.overlay_heatmap(path, cam, output_path),
+            iterations=ctx.iterations, warmup=ctx.warmup, params={'resolution': label}
+        ))
+    return results
+
+
+def bench_weather(ctx):
+    """Rule-based risk assessment for every disease against a few weather readings"""
+    from config import DISEASE_CLASSES
+    weather_service = stub_services()['weather']()
+    readings = [
+        SAMPLE_WEATHER,
+        dict(SAMPLE_WEATHER, temperature=31.0, humidity=40, condition='Sunny'),
+        dict(SAMPLE_WEATHER, temperature=12.0, humidity=95, condition='Patchy rain possible'),
+    ]
+    calls = [(disease, reading) for disease in DISEASE_CLASSES for reading in readings]
+
+    def assess_all():
+        for disease, reading in calls:
+            weather_service.assess_disease_risk(disease, reading)
+
+    return [measure("weather.assess_disease_risk", assess_all, iterations=ctx.iterations * 10,
+                    warmup=ctx.warmup, items_per_call=len(calls))]
+
+
+def bench_end_to_end(ctx):
+    """POST /api/detect-disease through the full app, with stubbed weather, remedy and speech services
+
+    Each request uploads a distinct image so the result cache never answers. Runs
+    sequentially and with concurrent requests sharing micro-batches.
+    """
+    return asyncio.run(_bench_end_to_end(ctx))
+
+
+async def _bench_end_to_end(ctx):
+    import main
+    from utils.lazy import LazyService
+
+    services = stub_services()
+    main.weather_service = LazyService(services['weather'], "WeatherService")
+    main.gemini_service = LazyService(services['gemini'], "GeminiService")
+    main.tts_service = LazyService(services['tts'], "TTSService")
+
+    # Preloaded model and Grad-CAM make the startup event's load_models() a no-op
+    main.disease_classifier = ctx.classifier
+    main.gradcam = ctx.gradcam
+    await main.startup_event()
+    await main.warmup_task
+
+    width, height = RESOLUTIONS['1080p']
+    concurrency = 4 if ctx.quick else 8
+    # Uploads are encoded up front so only the server's work is timed
+    uploads = {
+        i: jpeg_bytes(synthetic_image(width, height, seed=1000 + i))
+        for i in range(-ctx.warmup, ctx.iterations * 2)
+    }
+
+    async def detect(i):
+        body, content_type = multipart_body(
+            {'location': 'New York', 'language': 'english'},
+            {'file': (f'leaf_{i}.jpg', uploads[i], 'image/jpeg')}
+        )
+        status, payload = await asgi_request(main.app, 'POST', '/api/detect-disease', body, content_type)
+        if status != 200:
+            raise RuntimeError(f"/api/detect-disease returned {status}: {payload[:200]!r}")
+        return json.loads(payload)
+
+    try:
+        return [
+            await measure_async("e2e.detect_disease", detect, iterations=ctx.iterations,
+                                warmup=ctx.warmup, params={'resolution': '1080p'}),
+            await measure_async(
+                f"e2e.detect_disease[x{concurrency}]",
+                lambda i: detect(ctx.iterations + i if i >= 0 else i),
+                iterations=ctx.iterations, warmup=0, concurrency=concurrency,
+                params={'resolution': '1080p'}
+            ),
+        ]
+    finally:
+        await main.shutdown_event()
+
+
+SUITES = {
+    'preprocess': bench_preprocess,
+    'predict': bench_predict,
+    'gradcam': bench_gradcam,
+    'overlay': bench_overlay,
+    'weather': bench_weather,
+    'e2e': bench_end_to_end,
+}
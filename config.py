@@ -12,9 +12,74 @@ WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 
 # Model Configuration - Updated for local deployment
 MODEL_PATH = BASE_DIR / "attached_assets" / "efficientnet_greenlens.pth"
+# Plain state dict converted from MODEL_PATH; torch.load(mmap=True) maps it without copying
+MODEL_MMAP_PATH = MODEL_PATH.with_suffix(".state_dict.pt")
 MODEL_INPUT_SIZE = 224
+MODEL_RESIZE_SIZE = 256  # short side after Resize, before the center crop to MODEL_INPUT_SIZE
 NUM_CLASSES = 22
 
+# Inference engine for forward-only classification: eager, torchscript or onnx (needs onnxruntime)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "eager")
+TORCHSCRIPT_MODEL_PATH = MODEL_PATH.with_suffix(".torchscript.pt")
+ONNX_MODEL_PATH = MODEL_PATH.with_suffix(".onnx")
+ENGINE_PARITY_ATOL = float(os.getenv("ENGINE_PARITY_ATOL", 1e-3))
+
+# Reduced-precision CPU inference: fp32, int8_dynamic, int8_static or bf16.
+# Modes are checked against fp32 on the calibration images and rejected below PRECISION_MIN_AGREEMENT
+# (or when CALIBRATION_DIR has no images to check them on). The int8 modes hold a quantized copy next to
+# the fp32 model Grad-CAM needs, reported by /api/health; int8_dynamic only quantizes the Linear head and
+# has little effect on this model.
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32")
+CALIBRATION_DIR = Path(os.getenv("CALIBRATION_DIR", BASE_DIR / "attached_assets" / "calibration"))
+CALIBRATION_MAX_IMAGES = int(os.getenv("CALIBRATION_MAX_IMAGES", 128))
+PRECISION_MIN_AGREEMENT = float(os.getenv("PRECISION_MIN_AGREEMENT", 0.98))
+
+# Micro-batching - concurrent requests arriving within the wait window share one forward pass
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+# Batch endpoint limits
+BATCH_UPLOAD_MAX_IMAGES = int(os.getenv("BATCH_UPLOAD_MAX_IMAGES", 200))
+BATCH_UPLOAD_MAX_IMAGE_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_IMAGE_MB", 20)) * 1024 * 1024
+# Total image bytes of one batch after unzipping, so a small zip bomb can't fill memory
+BATCH_UPLOAD_MAX_TOTAL_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_TOTAL_MB", 512)) * 1024 * 1024
+
+# Startup warm-up and thread/batch autotuning; the tuned profile is persisted per host
+AUTOTUNE = os.getenv("AUTOTUNE", "True") == "True"
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", 2))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # server worker processes sharing this host
+
+# With WEB_CONCURRENCY > 1, load the model once and fork workers sharing its weights copy-on-write
+PREFORK = os.getenv("PREFORK", "True") == "True"
+MEMORY_REPORT_INTERVAL = int(os.getenv("MEMORY_REPORT_INTERVAL", 300))  # seconds between per-worker memory logs; 0 disables
+
+# Model execution in separate worker processes (0 runs it in the server process) with a bounded queue;
+# requests beyond INFERENCE_QUEUE_MAX waiting are rejected with 503 + Retry-After (0 = unbounded).
+# Each inference worker loads its own model copy, so memory grows by one model per worker; it is
+# ignored in preforked workers (PREFORK with WEB_CONCURRENCY > 1), which share the parent's model instead
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 0))
+INFERENCE_QUEUE_MAX = int(os.getenv("INFERENCE_QUEUE_MAX", 64))
+
+# Grad-CAMs computed per detection (predicted class plus runners-up) from the same forward pass;
+# requests choose how many of them to render with explain_top_k
+GRADCAM_TOP_K = int(os.getenv("GRADCAM_TOP_K", 3))
+
+# Grad-CAM is computed on first view of /api/gradcam/{id}: detection keeps a handle (upload bytes,
+# up to UPLOAD_MAX_MB, and the model input) and the raw low-resolution CAMs are cached once computed.
+# Handles are bounded by count and by their total bytes per worker
+GRADCAM_HANDLE_CACHE_SIZE = int(os.getenv("GRADCAM_HANDLE_CACHE_SIZE", 64))
+GRADCAM_HANDLE_CACHE_MAX_BYTES = int(os.getenv("GRADCAM_HANDLE_CACHE_MAX_MB", 256)) * 1024 * 1024
+GRADCAM_CAM_CACHE_SIZE = int(os.getenv("GRADCAM_CAM_CACHE_SIZE", 256))
+GRADCAM_CACHE_TTL = int(os.getenv("GRADCAM_CACHE_TTL", 60 * 60))
+
+# Rendered overlays are capped in resolution (long side, px) and encoded as jpeg or webp
+GRADCAM_MAX_SIDE = int(os.getenv("GRADCAM_MAX_SIDE", 1280))
+GRADCAM_IMAGE_FORMAT = os.getenv("GRADCAM_IMAGE_FORMAT", "jpeg").lower()
+GRADCAM_IMAGE_QUALITY = int(os.getenv("GRADCAM_IMAGE_QUALITY", 80))
+
+# Threads for CPU-bound image work (decode, preprocess, overlay) off the event loop
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", min(4, os.cpu_count() or 1)))
+
 # Disease Categories - Matching model exactly
 DISEASE_CLASSES = [
     "Apple___Apple_scab",
@@ -61,16 +126,73 @@ WEATHER_DISEASE_RULES = {
 }
 
 
+# Weather client - pooled connections, strict timeouts and a stale-while-revalidate cache
+WEATHER_CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT", 3))
+WEATHER_READ_TIMEOUT = float(os.getenv("WEATHER_READ_TIMEOUT", 5))
+WEATHER_POOL_SIZE = int(os.getenv("WEATHER_POOL_SIZE", 10))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", 512))
+WEATHER_UPDATE_INTERVAL = int(os.getenv("WEATHER_UPDATE_INTERVAL", 15 * 60))  # provider refresh interval
+WEATHER_MIN_TTL = int(os.getenv("WEATHER_MIN_TTL", 60))
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", 60 * 60))
+FORECAST_CACHE_TTL = int(os.getenv("FORECAST_CACHE_TTL", 60 * 60))
 
 UPLOAD_DIR = BASE_DIR / "uploads"
 OUTPUT_DIR = BASE_DIR / "outputs"
 STATIC_DIR = BASE_DIR / "static"
+CACHE_DIR = BASE_DIR / "cache"
+TEMP_AUDIO_DIR = BASE_DIR / "temp_audio"
+
+# Uploads are decoded in memory; set SAVE_UPLOADS=True to also keep them in UPLOAD_DIR
+SAVE_UPLOADS = os.getenv("SAVE_UPLOADS", "False") == "True"
+
+# Background janitor: generated files are evicted by age, then least recently used first
+# once a directory exceeds its size quota (per worker process)
+JANITOR_INTERVAL = int(os.getenv("JANITOR_INTERVAL", 60))  # seconds between sweeps
+UPLOAD_MAX_AGE = int(os.getenv("UPLOAD_MAX_AGE", 60 * 60))
+UPLOAD_DIR_MAX_BYTES = int(os.getenv("UPLOAD_DIR_MAX_MB", 1024)) * 1024 * 1024
+ARTIFACT_MAX_AGE = int(os.getenv("ARTIFACT_MAX_AGE", 24 * 60 * 60))  # Grad-CAM overlays, outputs
+ARTIFACT_DIR_MAX_BYTES = int(os.getenv("ARTIFACT_DIR_MAX_MB", 512)) * 1024 * 1024
+TEMP_AUDIO_MAX_AGE = int(os.getenv("TEMP_AUDIO_MAX_AGE", 60 * 60))
+
+# Opt-in per-request profiling (X-GreenLens-Profile header or ?profile=1); with PROFILING_TOKEN set
+# the flag's value must equal it. Artifacts are kept in PROFILE_DIR under the janitor's quotas.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_DIR = BASE_DIR / "profiles"
+PROFILE_MAX_AGE = int(os.getenv("PROFILE_MAX_AGE", 24 * 60 * 60))
+PROFILE_DIR_MAX_BYTES = int(os.getenv("PROFILE_DIR_MAX_MB", 256)) * 1024 * 1024
+
+# Hard upload limits: request bodies are counted as they stream in, pixels are checked from the header
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", 25)) * 1024 * 1024
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_MB", 512)) * 1024 * 1024
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_MEGAPIXELS", 100)) * 1_000_000
+
+# Remedy cache - memory LRU in front of an on-disk tier that survives restarts
+REMEDY_CACHE_DIR = CACHE_DIR / "remedies"
+REMEDY_CACHE_SIZE = int(os.getenv("REMEDY_CACHE_SIZE", 256))
+REMEDY_CACHE_TTL = int(os.getenv("REMEDY_CACHE_TTL", 6 * 3600))
+REMEDY_DISK_CACHE_TTL = int(os.getenv("REMEDY_DISK_CACHE_TTL", 7 * 24 * 3600))
+# DELETE /api/cache/remedies needs this token in the X-GreenLens-Admin-Token header; unset disables it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+RUNTIME_PROFILE_PATH = CACHE_DIR / "runtime_profile.json"
+
+# Whole-response cache for repeated uploads; TTL bounds how stale the weather-dependent parts get
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 512))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 15 * 60))
+
+# Content-addressed TTS audio, served from /static/audio
+AUDIO_CACHE_DIR = STATIC_DIR / "audio"
+AUDIO_CACHE_URL = "/static/audio"
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", 256)) * 1024 * 1024
+AUDIO_CACHE_MAX_FILES = int(os.getenv("AUDIO_CACHE_MAX_FILES", 2000))
 
 # Server
 HOST = os.getenv("HOST", "127.0.0.1")
 PORT = int(os.getenv("PORT", 5000))
 DEBUG = os.getenv("DEBUG", "True") == "True"
 
-# Ensure directories
-for d in (UPLOAD_DIR, OUTPUT_DIR, STATIC_DIR, STATIC_DIR / "outputs"):
-    d.mkdir(exist_ok=True)
+def ensure_directories():
+    """Create runtime directories; called at startup rather than as an import side effect"""
+    for d in (UPLOAD_DIR, OUTPUT_DIR, STATIC_DIR, STATIC_DIR / "outputs", CACHE_DIR, TEMP_AUDIO_DIR):
+        d.mkdir(parents=True, exist_ok=True)
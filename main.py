@@ -1,22 +1,52 @@
 import os
 import json
 import asyncio
+import hashlib
+import hmac
+import io
+import re
 import shutil
+import time
+import zipfile
+from functools import partial
 from pathlib import Path
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from typing import List
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
 import uvicorn
 
-# Import local modules
-from models.disease_classifier import DiseaseClassifier
-from models.gradcam import GradCAM
-from services.gemini_service import GeminiService
-from services.weather_service import WeatherService
-from services.tts_service import TTSService
-from utils.image_utils import save_uploaded_image, validate_image, cleanup_temp_files
-from config import UPLOAD_DIR, OUTPUT_DIR, STATIC_DIR, HOST, PORT, DEBUG
+# Import local modules; torch, torchvision, cv2 and the API clients are imported on first use
+from utils.timing import startup_timer
+from models.batch_scheduler import BatchScheduler, QueueFullError
+from services.audio_cache import AUDIO_NAME_PATTERN
+from utils.cache import TTLCache
+from utils.lazy import LazyService
+from utils.memory import process_memory, worker_group_memory, format_memory
+from utils.image_utils import (
+    decode_uploaded_image, decode_downscaled, HEATMAP_COLORMAPS, ImageTooLarge
+)
+from utils.janitor import ArtifactJanitor
+from utils.metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.profiling import RequestProfiler
+from utils.upload_limits import UploadSizeLimitMiddleware
+from config import (
+    UPLOAD_DIR, OUTPUT_DIR, STATIC_DIR, TEMP_AUDIO_DIR, HOST, PORT, DEBUG, ensure_directories,
+    BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, CPU_WORKERS, RESULT_CACHE_SIZE, RESULT_CACHE_TTL,
+    SAVE_UPLOADS, BATCH_UPLOAD_MAX_IMAGES, BATCH_UPLOAD_MAX_IMAGE_BYTES, BATCH_UPLOAD_MAX_TOTAL_BYTES,
+    AUTOTUNE, RUNTIME_PROFILE_PATH, WARMUP_ITERATIONS, WEB_CONCURRENCY, PREFORK, MEMORY_REPORT_INTERVAL,
+    INFERENCE_WORKERS, INFERENCE_QUEUE_MAX, GRADCAM_TOP_K,
+    GRADCAM_HANDLE_CACHE_SIZE, GRADCAM_HANDLE_CACHE_MAX_BYTES, GRADCAM_CAM_CACHE_SIZE, GRADCAM_CACHE_TTL,
+    GRADCAM_MAX_SIDE, GRADCAM_IMAGE_FORMAT, MODEL_RESIZE_SIZE,
+    UPLOAD_MAX_BYTES, BATCH_UPLOAD_MAX_BYTES, UPLOAD_MAX_PIXELS,
+    JANITOR_INTERVAL, UPLOAD_MAX_AGE, UPLOAD_DIR_MAX_BYTES, ARTIFACT_MAX_AGE, ARTIFACT_DIR_MAX_BYTES,
+    TEMP_AUDIO_MAX_AGE, PROFILING_ENABLED, PROFILING_TOKEN, PROFILE_DIR, PROFILE_MAX_AGE, PROFILE_DIR_MAX_BYTES,
+    ADMIN_TOKEN
+)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -34,33 +64,162 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cut off oversized uploads while they stream in, before they are parsed or spooled
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/api/detect-disease": UPLOAD_MAX_BYTES,
+    "/api/detect-disease/batch": BATCH_UPLOAD_MAX_BYTES,
+})
+
 # Initialize services
 disease_classifier = None
 gradcam = None
-gemini_service = GeminiService()
-weather_service = WeatherService()
-tts_service = TTSService()
+batch_scheduler = None
+gradcam_scheduler = None
+inference_pool = None
+runtime_profile = None
+runtime_ready = False
+warmup_task = None
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize models on startup"""
+# Set in forked workers when serving in prefork mode
+worker_index = None
+prefork_parent_pid = None
+
+def _gemini_service():
+    from services.gemini_service import GeminiService
+    return GeminiService()
+
+def _weather_service():
+    from services.weather_service import WeatherService
+    return WeatherService()
+
+def _tts_service():
+    from services.tts_service import TTSService
+    return TTSService()
+
+# External API clients are built on first use (or by the background startup phase)
+gemini_service = LazyService(_gemini_service, "GeminiService")
+weather_service = LazyService(_weather_service, "WeatherService")
+tts_service = LazyService(_tts_service, "TTSService")
+
+# Lazily computed Grad-CAMs: id -> handle to compute them from, and id -> {class_index: cam}
+def gradcam_handle_bytes(handle):
+    tensor = handle['tensor']
+    return len(handle['data']) + tensor.nelement() * tensor.element_size()
+
+gradcam_handles = TTLCache(
+    max_entries=GRADCAM_HANDLE_CACHE_SIZE, ttl_seconds=GRADCAM_CACHE_TTL,
+    max_bytes=GRADCAM_HANDLE_CACHE_MAX_BYTES, sizeof=gradcam_handle_bytes
+)
+gradcam_cams = TTLCache(max_entries=GRADCAM_CAM_CACHE_SIZE, ttl_seconds=GRADCAM_CACHE_TTL)
+pending_cams = {}
+
+# Whole-analysis cache for repeated uploads, keyed on (image hash, location, language)
+result_cache = TTLCache(max_entries=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL)
+
+# CPU-bound image work runs on a bounded pool; blocking network calls use Starlette's threadpool
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="greenlens-cpu")
+
+# Generated files on disk, expired by age and per-directory size quota from a background task.
+# Synthesized audio is not listed: AudioCache already bounds static/audio with its own LRU index.
+janitor = ArtifactJanitor(interval_seconds=JANITOR_INTERVAL)
+janitor.register('uploads', UPLOAD_DIR, max_age_seconds=UPLOAD_MAX_AGE, max_bytes=UPLOAD_DIR_MAX_BYTES)
+janitor.register('gradcam_outputs', STATIC_DIR / "outputs",
+                 max_age_seconds=ARTIFACT_MAX_AGE, max_bytes=ARTIFACT_DIR_MAX_BYTES)
+janitor.register('outputs', OUTPUT_DIR, max_age_seconds=ARTIFACT_MAX_AGE, max_bytes=ARTIFACT_DIR_MAX_BYTES)
+janitor.register('temp_audio', TEMP_AUDIO_DIR, max_age_seconds=TEMP_AUDIO_MAX_AGE)
+janitor.register('profiles', PROFILE_DIR, max_age_seconds=PROFILE_MAX_AGE, max_bytes=PROFILE_DIR_MAX_BYTES)
+
+# Opt-in profiling of single detection requests (PROFILING_ENABLED)
+request_profiler = RequestProfiler(PROFILE_DIR, enabled=PROFILING_ENABLED, token=PROFILING_TOKEN)
+
+# Prometheus metrics served at /api/metrics. Stage timings are recorded as requests run;
+# cache, error and queue figures are read from the components' own counters on each scrape.
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    'greenlens_stage_duration_seconds',
+    'Time spent in each detection pipeline stage (inference and gradcam include batching queue wait)',
+    ['stage']
+)
+detection_seconds = metrics.histogram(
+    'greenlens_detection_duration_seconds',
+    'Time to answer a detection request, until the last streamed event for stream=true',
+    ['mode', 'cached']
+)
+
+def cache_stats():
+    """Stats of every cache, skipping services that have not been loaded yet"""
+    caches = {
+        'result': result_cache.stats(),
+        'gradcam_handles': gradcam_handles.stats(),
+        'gradcam_cams': gradcam_cams.stats(),
+    }
+    if gemini_service.loaded:
+        caches['remedy'] = gemini_service.remedy_cache.stats()
+    if weather_service.loaded:
+        caches['weather'] = weather_service.cache_stats()
+    if tts_service.loaded:
+        caches['audio'] = tts_service.audio_cache.stats()
+    return caches
+
+def upstream_errors():
+    services = {'weather': weather_service, 'gemini': gemini_service, 'tts': tts_service}
+    return {
+        name: getattr(service, 'upstream_errors', None)
+        for name, service in services.items() if service.loaded
+    }
+
+def schedulers():
+    return {
+        name: scheduler
+        for name, scheduler in (('detection', batch_scheduler), ('gradcam', gradcam_scheduler))
+        if scheduler is not None
+    }
+
+def cache_hits():
+    """Hits per (cache, tier); the remedy cache is split by the tier that answered"""
+    hits = {}
+    for name, stats in cache_stats().items():
+        if name == 'remedy':
+            for tier, count in gemini_service.remedy_cache.tier_hits().items():
+                hits[(name, tier)] = count
+        else:
+            hits[(name, 'disk' if name == 'audio' else 'memory')] = stats['hits']
+    return hits
+
+metrics.counter('greenlens_cache_hits_total', 'Cache lookups answered from the cache', ['cache', 'tier'],
+                callback=cache_hits)
+metrics.counter('greenlens_cache_misses_total', 'Cache lookups that missed', ['cache'],
+                callback=lambda: {name: stats['misses'] for name, stats in cache_stats().items()})
+metrics.counter('greenlens_upstream_errors_total', 'Failed calls to external services', ['service'],
+                callback=upstream_errors)
+metrics.gauge('greenlens_queue_depth', 'Images waiting for a model batch', ['scheduler'],
+              callback=lambda: {name: scheduler.queue_depth for name, scheduler in schedulers().items()})
+metrics.gauge('greenlens_batches_in_flight', 'Model batches currently running', ['scheduler'],
+              callback=lambda: {name: scheduler.in_flight for name, scheduler in schedulers().items()})
+metrics.counter('greenlens_queue_rejections_total', 'Requests rejected because the inference queue was full',
+                ['scheduler'],
+                callback=lambda: {name: scheduler.stats()['rejected'] for name, scheduler in schedulers().items()})
+
+async def run_cpu(func, *args, **kwargs):
+    """Run a CPU-bound function on the image executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, partial(func, *args, **kwargs))
+
+def load_models():
+    """Load the classifier and Grad-CAM; a no-op when already loaded (e.g. inherited by a forked worker)"""
     global disease_classifier, gradcam
-    
-    print("🌱 Starting GreenLens Local Server...")
-    
-    # Create necessary directories
-    UPLOAD_DIR.mkdir(exist_ok=True)
-    OUTPUT_DIR.mkdir(exist_ok=True)
-    STATIC_DIR.mkdir(exist_ok=True)
-    
-    # Create outputs directory in static for serving
-    static_outputs = STATIC_DIR / "outputs"
-    static_outputs.mkdir(exist_ok=True)
-    
+    if disease_classifier is not None:
+        return
+
+    with startup_timer.phase("import_models"):
+        from models.disease_classifier import DiseaseClassifier
+        from models.gradcam import GradCAM
+
     # Initialize disease classifier
     print("📊 Loading disease classification model...")
     try:
-        disease_classifier = DiseaseClassifier()
+        with startup_timer.phase("model"):
+            disease_classifier = DiseaseClassifier()
         print("✅ Disease classifier loaded successfully!")
     except Exception as e:
         print(f"❌ Error loading disease classifier: {e}")
@@ -69,136 +228,1150 @@ async def startup_event():
     # Initialize Grad-CAM
     print("🔍 Initializing Grad-CAM...")
     try:
-        gradcam = GradCAM(disease_classifier.model)
+        with startup_timer.phase("gradcam"):
+            gradcam = GradCAM(disease_classifier.model, model_lock=disease_classifier.model_lock)
         print("✅ Grad-CAM initialized successfully!")
     except Exception as e:
         print(f"❌ Error initializing Grad-CAM: {e}")
         raise
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize models on startup"""
+    global batch_scheduler, gradcam_scheduler, inference_pool, runtime_profile, warmup_task
+    
+    print("🌱 Starting GreenLens Local Server...")
+    
+    # Create necessary directories
+    with startup_timer.phase("directories"):
+        ensure_directories()
+
+    # Generated files are expired in the background instead of scanning directories per request
+    with startup_timer.phase("janitor"):
+        await janitor.start()
+
+    # Preforked workers inherit the model from the parent; otherwise load it here
+    load_models()
+    from models.runtime import host_fingerprint, load_profile, threads_per_worker
+
+    # Model execution moves to worker processes; they are spawned and warmed up in the background.
+    # Preforked workers already share the parent's model, and a pool each would load one copy per worker
+    pool_workers = INFERENCE_WORKERS
+    if pool_workers > 0 and prefork_parent_pid is not None:
+        if worker_index == 0:
+            print("⚠️  INFERENCE_WORKERS is ignored with PREFORK, running the shared model in each server worker")
+        pool_workers = 0
+    if pool_workers > 0 and inference_pool is None:
+        from models.inference_pool import InferencePool
+        inference_pool = InferencePool(
+            pool_workers,
+            num_threads=threads_per_worker(model_processes()),
+            warmup_iterations=WARMUP_ITERATIONS,
+            top_k=GRADCAM_TOP_K
+        )
+
+    # Micro-batching schedulers: forward-only classification on the detection path, and the
+    # Grad-CAM backward pass (top-k classes at once) when a heatmap is first viewed
+    batch_scheduler = BatchScheduler(
+        inference_backend().predict_batch,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_concurrency=pool_workers or 1,
+        max_queue_depth=INFERENCE_QUEUE_MAX
+    )
+    gradcam_scheduler = BatchScheduler(
+        explain_requests,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_concurrency=pool_workers or 1,
+        max_queue_depth=INFERENCE_QUEUE_MAX
+    )
+    await batch_scheduler.start()
+    await gradcam_scheduler.start()
+
+    # Apply this host's persisted thread/batch profile; warm-up (and first-boot tuning) runs in the background
+    fingerprint = host_fingerprint(disease_classifier, model_processes())
+    runtime_profile = load_profile(RUNTIME_PROFILE_PATH, fingerprint)
+    if runtime_profile is not None:
+        apply_runtime_profile(runtime_profile)
+    print(f"📦 Batching up to {batch_scheduler.max_batch_size} images per {BATCH_MAX_WAIT_MS:g} ms window")
+    warmup_task = asyncio.ensure_future(prepare_runtime(fingerprint))
     
     print("🚀 GreenLens Local Server is ready!")
     print(f"🌐 Access the application at: http://{HOST}:{PORT}")
 
+def model_processes():
+    """Processes on this host running the model, which share its cores"""
+    if inference_pool is not None:
+        return WEB_CONCURRENCY * inference_pool.workers
+    return WEB_CONCURRENCY
+
+def inference_backend():
+    """Where batches run: the inference process pool, or the in-process classifier"""
+    return inference_pool if inference_pool is not None else disease_classifier
+
+def explain_requests(requests):
+    """Grad-CAM batch function; each request is (image tensor, class indices to explain or None, top-k when None)"""
+    tensors, class_indices, top_k = zip(*requests)
+    return inference_backend().explain_batch(
+        list(tensors), gradcam=gradcam, top_k=list(top_k), class_indices=list(class_indices)
+    )
+
+def overloaded(retry_after):
+    """503 telling the client when the inference queue should have room again"""
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy analyzing other images, please retry shortly",
+        headers={'Retry-After': str(retry_after)}
+    )
+
+def apply_runtime_profile(profile):
+    """Apply tuned torch thread counts and the tuned batch size"""
+    from models.runtime import apply_profile
+    apply_profile(profile)
+    if AUTOTUNE:
+        batch_scheduler.max_batch_size = profile['batch_size']
+        gradcam_scheduler.max_batch_size = profile['batch_size']
+    print(f"🧵 Runtime profile: {profile['num_threads']} threads, batch size {profile['batch_size']}")
+
+def tune_runtime(fingerprint):
+    """Benchmark thread counts and batch sizes on this host and persist the result"""
+    from models.runtime import autotune, save_profile
+    print("⏱️  No runtime profile for this host, autotuning threads and batch size...")
+    profile = autotune(disease_classifier, workers=model_processes())
+    save_profile(RUNTIME_PROFILE_PATH, fingerprint, profile)
+    return profile
+
+async def prepare_runtime(fingerprint):
+    """Background startup phase; /api/health reports ready only once it finishes"""
+    global runtime_profile, runtime_ready
+    from models.runtime import warm_up
+    loop = asyncio.get_running_loop()
+
+    # Build the API clients off the request path so the first detection doesn't pay for their imports
+    for name, service in (("weather", weather_service), ("gemini", gemini_service), ("tts", tts_service)):
+        try:
+            with startup_timer.phase(f"service.{name}"):
+                await loop.run_in_executor(None, service.load)
+        except Exception as e:
+            print(f"⚠️  Could not preload {name} service: {e}")
+
+    try:
+        # First boot on this host: tune, then apply from the event loop thread like a persisted profile.
+        # Preforked workers never tune; the parent did before forking them (see tune_before_fork)
+        if runtime_profile is None and AUTOTUNE and prefork_parent_pid is None:
+            runtime_profile = await loop.run_in_executor(None, tune_runtime, fingerprint)
+            apply_runtime_profile(runtime_profile)
+
+        if inference_pool is not None:
+            # Each worker runs with the tuned thread count and warms up its own model as it starts
+            if runtime_profile is not None:
+                inference_pool.num_threads = runtime_profile['num_threads']
+            with startup_timer.phase("inference_pool"):
+                workers = await loop.run_in_executor(None, inference_pool.start)
+            print(f"🔥 {len(workers)} inference workers ready")
+        else:
+            batch_sizes = sorted({1, batch_scheduler.max_batch_size})
+            elapsed = await loop.run_in_executor(
+                None, partial(
+                    warm_up, disease_classifier, gradcam,
+                    batch_sizes=batch_sizes, iterations=WARMUP_ITERATIONS, top_k=GRADCAM_TOP_K
+                )
+            )
+            print(f"🔥 Model warm-up finished in {elapsed:.1f}s")
+    except Exception as e:
+        # A failed warm-up only costs latency on the first requests; don't keep the worker out of rotation
+        print(f"⚠️  Model warm-up failed: {e}")
+    runtime_ready = True
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers on shutdown"""
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    for scheduler in (batch_scheduler, gradcam_scheduler):
+        if scheduler is not None:
+            await scheduler.stop()
+    if inference_pool is not None:
+        inference_pool.shutdown(wait=False, cancel_futures=True)
+    await janitor.stop()
+    cpu_executor.shutdown(wait=False)
+
 # Mount static files - Order matters!
 @app.get("/")
 async def root():
     """Serve the main application"""
     return FileResponse(STATIC_DIR / "index.html")
 
-# API Routes first, then static files mount
-@app.post("/api/detect-disease")
-async def detect_disease(
-    file: UploadFile = File(...),
-    location: str = Form(default="New York")
-):
-    """Main endpoint for disease detection"""
-    try:
-        # Validate file
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
+def profiled(profile, stage, func, torch_ops=False):
+    """``func`` itself, or wrapped to run under the request's profiler when it is being profiled"""
+    if profile is None:
+        return func
+    return partial(profile.run, stage, func, torch_ops=torch_ops)
 
-        # Save uploaded file
-        file_content = await file.read()
-        image_path = save_uploaded_image(file_content, str(UPLOAD_DIR))
+async def run_detection_stages(upload, location, language="english", explain_top_k=1, profile=None):
+    """Run the detection stage graph, yielding (event, payload) as each stage completes
 
-        # Validate image
-        if not validate_image(image_path):
-            raise HTTPException(status_code=400, detail="Invalid image file")
+    ``upload`` is a decoded UploadedImage shared by classification and Grad-CAM.
+    A profiled request (``profile``) runs its own forward pass instead of joining a
+    micro-batch and computes its Grad-CAMs right away, so the capture holds only its work.
 
-        # Check if models are loaded
-        if disease_classifier is None:
-            raise HTTPException(status_code=500, detail="Disease classifier not loaded")
-        if gradcam is None:
-            raise HTTPException(status_code=500, detail="Grad-CAM not initialized")
+    Weather is fetched while the model runs; only the forward pass is on this path, the
+    gradcam event carries a /api/gradcam/{id} URL that computes the heatmap on first view.
+    Events: prediction, gradcam, weather, remedy, audio. With ``explain_top_k`` > 1 the
+    gradcam event also links heatmaps for the runner-up classes.
+    """
+    events = asyncio.Queue()
 
-        # Predict disease
-        print(f"🔍 Predicting disease for image: {image_path}")
-        prediction = disease_classifier.predict(image_path)
-        print(f"📊 Prediction: {prediction}")
+    # Weather does not depend on the image, so fetch it while the model runs
+    print(f"🌤️ Getting weather data for: {location}")
+    async def fetch_weather():
+        with stage_seconds.time(stage='weather'):
+            return await run_in_threadpool(profiled(profile, 'weather', weather_service.get_weather_data), location)
 
-        # Generate Grad-CAM visualization
-        print("🎨 Generating Grad-CAM visualization...")
-        gradcam_path = gradcam.generate_gradcam_image(
-            image_path,
-            str(STATIC_DIR / "outputs")
-        )
+    weather_task = asyncio.ensure_future(fetch_weather())
+    stage_tasks = [weather_task]
 
-        gradcam_url = None
-        if gradcam_path:
-            gradcam_url = f"/static/outputs/{Path(gradcam_path).name}"
-            print(f"✅ Grad-CAM image saved: {gradcam_path}")
-        else:
-            print("❌ Failed to generate Grad-CAM image")
+    async def gradcam_stage(prediction, image_tensor):
+        # The classes listed for this prediction are the ones explained later, whichever
+        # engine made it; a re-ranking by the Grad-CAM pass could otherwise drop one
+        class_indices = [entry['class_index'] for entry in disease_classifier.top_classes(prediction, GRADCAM_TOP_K)]
+        if profile is not None and gradcam_cams.get(upload.id) is None:
+            # Normally deferred to the first view; computed now so it shows up in the profile
+            [(_, explanations)] = await run_cpu(
+                profile.run, 'gradcam', disease_classifier.explain_batch,
+                [image_tensor], gradcam, top_k=GRADCAM_TOP_K, class_indices=[class_indices], torch_ops=True
+            )
+            gradcam_cams.set(upload.id, {entry['class_index']: entry['cam'] for entry in explanations})
+
+        # Keep what's needed to compute the heatmap on first view; nothing is rendered yet
+        gradcam_handles.set(upload.id, {
+            'data': upload.data,
+            'tensor': image_tensor,
+            'class_index': prediction['class_index'],
+            'class_indices': class_indices,
+        })
+        gradcam_url = f"/api/gradcam/{upload.id}"
 
-        # Get weather data
-        print(f"🌤️ Getting weather data for: {location}")
-        weather_data = weather_service.get_weather_data(location)
+        payload = {'gradcam_image': gradcam_url, 'gradcam_id': upload.id}
+        if explain_top_k > 1:
+            payload['gradcam_topk'] = [
+                dict(entry, gradcam_image=f"{gradcam_url}?class_index={entry['class_index']}")
+                for entry in disease_classifier.top_classes(prediction, explain_top_k)
+            ]
+        await events.put(('gradcam', payload))
+
+    async def advice_stage(prediction):
+        weather_data = await weather_task
 
         # Assess disease risk based on weather
         print("⚠️ Assessing disease risk...")
-        risk_assessment = weather_service.assess_disease_risk(
-            prediction['disease'], weather_data
-        )
+        with stage_seconds.time(stage='risk'):
+            risk_assessment = profiled(profile, 'risk', weather_service.assess_disease_risk)(
+                prediction['disease'], weather_data
+            )
+        await events.put(('weather', {
+            'weather': weather_data,
+            'risk_assessment': risk_assessment,
+            'location': location
+        }))
 
         # Generate AI remedy
         print("🤖 Generating AI remedy...")
-        remedy_text = gemini_service.generate_disease_remedy(
-            prediction['disease'], weather_data
-        )
+        with stage_seconds.time(stage='remedy'):
+            remedy_text = await run_in_threadpool(
+                profiled(profile, 'remedy', gemini_service.generate_disease_remedy),
+                prediction['disease'], weather_data
+            )
+        await events.put(('remedy', {'remedy': remedy_text}))
+
+        # Generate TTS audio
+        print("🔊 Generating TTS audio...")
+        with stage_seconds.time(stage='tts'):
+            audio_url = await run_in_threadpool(
+                profiled(profile, 'tts', tts_service.create_comprehensive_audio),
+                prediction['disease'], remedy_text, risk_assessment, language
+            )
+        await events.put(('audio', {'audio_url': audio_url}))
+
+    try:
+        # Predict disease and compute Grad-CAM in one pass (batched with concurrent requests)
+        print(f"🔍 Predicting disease for upload: {upload.id}")
+        with stage_seconds.time(stage='preprocess'):
+            image_tensor, _ = await run_cpu(
+                profiled(profile, 'preprocess', disease_classifier.preprocess_image, torch_ops=True), upload.image
+            )
+        with stage_seconds.time(stage='inference'):
+            if profile is None:
+                prediction = await batch_scheduler.submit(image_tensor)
+            else:
+                [prediction] = await run_cpu(
+                    profile.run, 'inference', disease_classifier.predict_batch, [image_tensor], torch_ops=True
+                )
+        print(f"📊 Prediction: {prediction}")
 
         # Generate image analysis
-        print("📸 Generating image analysis...")
         clean_disease = prediction['disease'].replace('___', ' - ').replace('_', ' ')
         image_analysis = f"Detected {clean_disease} with {prediction['confidence']*100:.1f}% confidence. Please review the highlighted areas in the visualization above for signs of disease symptoms."
 
-        # Generate TTS audio
-        print("🔊 Generating TTS audio...")
-        audio_base64 = tts_service.create_comprehensive_audio(
-            prediction['disease'], remedy_text, risk_assessment
-        )
-
-        # Prepare response
-        response = {
-            'success': True,
+        yield 'prediction', {
             'disease': prediction['disease'],
             'confidence': prediction['confidence'],
-            'gradcam_image': gradcam_url,
-            'weather': weather_data,
-            'risk_assessment': risk_assessment,
-            'remedy': remedy_text,
-            'image_analysis': image_analysis,
-            'audio': audio_base64,
-            'location': location
+            'image_analysis': image_analysis
         }
 
-        print("✅ Analysis complete, sending response")
+        stage_tasks.append(asyncio.ensure_future(gradcam_stage(prediction, image_tensor)))
+        stage_tasks.append(asyncio.ensure_future(advice_stage(prediction)))
+
+        # Forward stage events as they arrive; a None sentinel marks the end of the graph
+        stages = asyncio.gather(*stage_tasks[1:])
+        stages.add_done_callback(lambda _: events.put_nowait(None))
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        stages.result()
+
+    finally:
+        for task in stage_tasks:
+            if not task.done():
+                task.cancel()
+
+async def read_upload(file):
+    """Check the content type and read the raw bytes of an uploaded image"""
+    # Validate file
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    return await file.read()
+
+async def ingest_upload(file_content, profile=None):
+    """Decode (and thereby validate) upload bytes once, in memory"""
+    # The model only needs a MODEL_RESIZE_SIZE short side, so JPEGs are decoded at reduced scale
+    try:
+        with stage_seconds.time(stage='decode'):
+            upload = await run_cpu(
+                profiled(profile, 'decode', decode_uploaded_image), file_content,
+                min_short_side=MODEL_RESIZE_SIZE, max_pixels=UPLOAD_MAX_PIXELS
+            )
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    # Only touch the filesystem when uploads are meant to be kept
+    if SAVE_UPLOADS:
+        path = await run_cpu(upload.save, str(UPLOAD_DIR))
+        janitor.track('uploads', path, size=len(file_content))
+
+    # Check if models are loaded
+    if disease_classifier is None:
+        raise HTTPException(status_code=500, detail="Disease classifier not loaded")
+    if gradcam is None:
+        raise HTTPException(status_code=500, detail="Grad-CAM not initialized")
+
+    return upload
+
+def result_cache_key(file_content, location, language, explain_top_k=1):
+    """Key a detection result on the image content, location, audio language and explained classes"""
+    from services.weather_service import normalize_location
+    return (
+        hashlib.sha256(file_content).hexdigest(), normalize_location(location), language.lower(), explain_top_k
+    )
+
+def detection_degraded(recorded_events):
+    """Whether a detection run served fallbacks for a failed weather, remedy or TTS stage"""
+    for event, payload in recorded_events:
+        if event == 'weather' and payload.get('weather') is None:
+            return True
+        if event == 'remedy' and gemini_service.is_fallback_remedy(payload.get('remedy')):
+            return True
+        if event == 'audio' and payload.get('audio_url') is None:
+            return True
+    return False
+
+def static_artifacts_exist(recorded_events):
+    """Check that artifacts referenced by cached events (Grad-CAM, audio) can still be served"""
+    for _, payload in recorded_events:
+        gradcam_id = payload.get('gradcam_id')
+        if gradcam_id and gradcam_handles.get(gradcam_id) is None:
+            return False
+        for key in ('gradcam_image', 'audio_url'):
+            url = payload.get(key)
+            if url and url.startswith('/static/') and not (STATIC_DIR / url[len('/static/'):]).exists():
+                return False
+    return True
+
+async def record_detection_events(events, cache_key):
+    """Pass events through, storing them in the result cache once the run completes
+
+    A run where weather, remedy or audio fell back to a placeholder is not cached, so
+    a repeated upload retries the upstream services instead of replaying the failure.
+    """
+    recorded = []
+    async for event, payload in events:
+        recorded.append((event, payload))
+        yield event, payload
+    if detection_degraded(recorded):
+        print("⚠️ Not caching analysis with degraded weather, remedy or audio")
+        return
+    result_cache.set(cache_key, recorded)
+
+async def profile_detection_events(events, profile):
+    """Pass events through, then save the request's profile and announce where to find it"""
+    try:
+        async for event, payload in events:
+            yield event, payload
+    except BaseException:
+        request_profiler.discard(profile)
+        raise
+    for path in await run_cpu(request_profiler.finish, profile):
+        janitor.track('profiles', path)
+    yield 'profile', {
+        'profile_id': profile.id, 'profile_url': f"/api/profiles/{profile.id}", 'profile_notes': profile.notes
+    }
+
+async def replay_detection_events(recorded_events):
+    """Replay a cached detection run"""
+    yield 'cache', {'cached': True}
+    for event, payload in recorded_events:
+        yield event, payload
+
+async def stream_detection_events(events, started=None, cached=False):
+    """Serialize detection events as NDJSON lines, ending with the complete response"""
+    response = {'success': True}
+    serialization = 0.0
+
+    def serialize(event, payload):
+        nonlocal serialization
+        serialize_started = time.perf_counter()
+        line = json.dumps({'event': event, 'data': payload}) + "\n"
+        serialization += time.perf_counter() - serialize_started
+        return line
 
-        # Cleanup temporary files
-        cleanup_temp_files(str(UPLOAD_DIR), max_age_hours=1)
+    try:
+        async for event, payload in events:
+            response.update(payload)
+            yield serialize(event, payload)
 
-        return JSONResponse(content=response)
+        print("✅ Analysis complete, stream finished")
+        yield serialize('complete', response)
+        stage_seconds.observe(serialization, stage='serialization')
+        if started is not None:
+            detection_seconds.observe(time.perf_counter() - started, mode='stream', cached=str(cached).lower())
 
+    except Exception as e:
+        print(f"❌ Error in streamed disease detection: {e}")
+        import traceback
+        traceback.print_exc()
+        yield json.dumps({'event': 'error', 'data': {'detail': str(e)}}) + "\n"
+
+# API Routes first, then static files mount
+@app.post("/api/detect-disease")
+async def detect_disease(
+    request: Request,
+    file: UploadFile = File(...),
+    location: str = Form(default="New York"),
+    language: str = Form(default="english"),
+    stream: bool = Form(default=False),
+    explain_top_k: int = Form(default=1)
+):
+    """Main endpoint for disease detection
+
+    With ``stream=true`` the results are sent as NDJSON events (prediction, gradcam,
+    weather, remedy, audio, complete) as soon as each stage finishes. Repeat uploads
+    of the same image for the same location and language are served from the result cache.
+    ``explain_top_k`` (up to GRADCAM_TOP_K) adds Grad-CAM overlays for the runner-up classes.
+
+    With PROFILING_ENABLED, an ``X-GreenLens-Profile`` header or ``?profile=1`` captures
+    a cProfile/torch.profiler profile of this request; its ID is returned in the
+    ``profile`` event and the ``X-GreenLens-Profile-Id`` header.
+    """
+    started = time.perf_counter()
+    profile = request_profiler.begin(request.headers, request.query_params)
+    if profile is not None and inference_pool is not None:
+        # The worker processes can't be profiled from here, so the model runs in this one
+        profile.notes.append(
+            "Inference and Grad-CAM ran in the server process rather than the inference pool, "
+            "outside the micro-batcher and its queue bound; their timings and traces reflect "
+            "in-process execution, not the pool workers."
+        )
+    handed_off = False
+    try:
+        with stage_seconds.time(stage='upload_read'):
+            file_content = await read_upload(file)
+        explain_top_k = max(1, min(explain_top_k, GRADCAM_TOP_K))
+
+        cache_key = result_cache_key(file_content, location, language, explain_top_k)
+        # A profiled request always runs the pipeline
+        recorded_events = result_cache.get(cache_key) if profile is None else None
+        cached = recorded_events is not None and static_artifacts_exist(recorded_events)
+        if cached:
+            print("♻️ Serving cached analysis for repeated upload")
+            events = replay_detection_events(recorded_events)
+        else:
+            # Shed load before decoding an image the inference queue has no room for
+            if batch_scheduler is not None and batch_scheduler.is_full:
+                raise overloaded(batch_scheduler.retry_after())
+            upload = await ingest_upload(file_content, profile)
+            events = record_detection_events(
+                run_detection_stages(upload, location, language, explain_top_k, profile), cache_key
+            )
+
+        headers = {}
+        if profile is not None:
+            events = profile_detection_events(events, profile)
+            headers['X-GreenLens-Profile-Id'] = profile.id
+
+        if stream:
+            # The stream now owns the profile and saves or discards it; if the client goes away
+            # before the stream is iterated, the background task still frees the profiling slot
+            handed_off = True
+            return StreamingResponse(
+                stream_detection_events(events, started=started, cached=cached),
+                media_type="application/x-ndjson",
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **headers},
+                background=BackgroundTask(request_profiler.discard, profile) if profile is not None else None
+            )
+
+        # Prepare response
+        response = {'success': True}
+        async for event, payload in events:
+            response.update(payload)
+
+        print("✅ Analysis complete, sending response")
+
+        with stage_seconds.time(stage='serialization'):
+            json_response = JSONResponse(content=response, headers=headers)
+        detection_seconds.observe(time.perf_counter() - started, mode='json', cached=str(cached).lower())
+        return json_response
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise overloaded(e.retry_after)
     except Exception as e:
         print(f"❌ Error in disease detection: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if profile is not None and not handed_off:
+            request_profiler.discard(profile)
+
+BATCH_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+def extract_zip_images(zip_bytes, max_total_bytes=BATCH_UPLOAD_MAX_TOTAL_BYTES):
+    """Return (filename, bytes) for every image file inside a zip archive
+
+    Raises 413 once the images' uncompressed size passes ``max_total_bytes``; the
+    declared sizes are checked before reading, and zipfile never reads past them.
+    """
+    images = []
+    total_bytes = 0
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as archive:
+        for member in archive.infolist():
+            name = member.filename
+            if member.is_dir() or name.startswith('__MACOSX/') or not name.lower().endswith(BATCH_IMAGE_EXTENSIONS):
+                continue
+            if member.file_size > BATCH_UPLOAD_MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=413, detail=f"{name} exceeds the per-image size limit")
+            total_bytes += member.file_size
+            if total_bytes > max_total_bytes:
+                raise HTTPException(status_code=413, detail="Batch exceeds the total uncompressed size limit")
+            images.append((name, archive.read(member)))
+            if len(images) > BATCH_UPLOAD_MAX_IMAGES:
+                break
+    return images
+
+async def read_batch_uploads(files):
+    """Flatten uploaded images and zip archives into a list of (filename, bytes)"""
+    images = []
+    total_bytes = 0
+    for file in files:
+        data = await file.read()
+        filename = file.filename or f"image_{len(images) + 1}"
+        is_zip = filename.lower().endswith('.zip') or (file.content_type or '') in (
+            'application/zip', 'application/x-zip-compressed'
+        )
+        if is_zip:
+            try:
+                extracted = await run_cpu(extract_zip_images, data, BATCH_UPLOAD_MAX_TOTAL_BYTES - total_bytes)
+                total_bytes += sum(len(image) for _, image in extracted)
+                images.extend(extracted)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{filename} is not a valid zip archive")
+        elif file.content_type and file.content_type.startswith('image/'):
+            total_bytes += len(data)
+            if total_bytes > BATCH_UPLOAD_MAX_TOTAL_BYTES:
+                raise HTTPException(status_code=413, detail="Batch exceeds the total uncompressed size limit")
+            images.append((filename, data))
+        else:
+            raise HTTPException(status_code=400, detail=f"{filename} must be an image or a zip of images")
+
+        if len(images) > BATCH_UPLOAD_MAX_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {BATCH_UPLOAD_MAX_IMAGES} images can be analyzed per batch"
+            )
+    return images
+
+def decode_batch_image(file_data):
+    """Decode one batch image, returning None instead of raising for invalid files"""
+    try:
+        return decode_uploaded_image(file_data, min_short_side=MODEL_RESIZE_SIZE, max_pixels=UPLOAD_MAX_PIXELS)
+    except ValueError:
+        return None
+
+def summarize_field(results, disease_reports):
+    """Aggregate per-image predictions into a field-level summary"""
+    analyzed = [result for result in results if 'error' not in result]
+    disease_counts = {}
+    confidence_totals = {}
+    for result in analyzed:
+        disease_counts[result['disease']] = disease_counts.get(result['disease'], 0) + 1
+        confidence_totals[result['disease']] = confidence_totals.get(result['disease'], 0.0) + result['confidence']
+
+    healthy_count = sum(count for disease, count in disease_counts.items() if 'healthy' in disease.lower())
+    risk_order = {'unknown': 0, 'low': 1, 'moderate': 2, 'high': 3}
+    risk_levels = [
+        report['risk_assessment'].get('risk_level', 'unknown')
+        for disease, report in disease_reports.items() if 'healthy' not in disease.lower()
+    ]
+
+    return {
+        'total_images': len(results),
+        'analyzed_images': len(analyzed),
+        'failed_images': len(results) - len(analyzed),
+        'healthy_images': healthy_count,
+        'diseased_images': len(analyzed) - healthy_count,
+        'diseased_fraction': (len(analyzed) - healthy_count) / len(analyzed) if analyzed else 0.0,
+        'mean_confidence': sum(r['confidence'] for r in analyzed) / len(analyzed) if analyzed else 0.0,
+        'diseases': {
+            disease: {
+                'count': count,
+                'fraction': count / len(analyzed),
+                'mean_confidence': confidence_totals[disease] / count
+            }
+            for disease, count in sorted(disease_counts.items(), key=lambda item: -item[1])
+        },
+        'highest_risk_level': max(risk_levels, key=lambda level: risk_order.get(level, 0)) if risk_levels else 'unknown'
+    }
+
+@app.post("/api/detect-disease/batch")
+async def detect_disease_batch(
+    files: List[UploadFile] = File(...),
+    location: str = Form(default="New York"),
+    language: str = Form(default="english"),
+    include_gradcam: bool = Form(default=False)
+):
+    """Analyze many images (or zip archives of images) from one field visit
+
+    Classification runs as tensor batches, weather is fetched once, and the remedy
+    and audio are generated once per distinct disease found.
+    """
+    try:
+        if disease_classifier is None:
+            raise HTTPException(status_code=500, detail="Disease classifier not loaded")
+
+        images = await read_batch_uploads(files)
+        if not images:
+            raise HTTPException(status_code=400, detail="No images found in upload")
+
+        # Images go through the same bounded queue as single detections; shed load before decoding
+        scheduler = gradcam_scheduler if include_gradcam else batch_scheduler
+        if scheduler.is_full:
+            raise overloaded(scheduler.retry_after())
+        print(f"🗂️ Batch analysis of {len(images)} images for: {location}")
+
+        # Weather is shared by the whole batch, fetch it while the model runs
+        weather_task = asyncio.ensure_future(
+            run_in_threadpool(weather_service.get_weather_data, location)
+        )
+        results = [{'filename': filename, 'error': 'Invalid image file'} for filename, _ in images]
+        predictions = []
+        try:
+            # Decode, classify and render one batch-sized chunk at a time, so a large upload never
+            # holds more than a chunk of decoded images or more than a batch of queue slots
+            chunk_size = scheduler.max_batch_size
+            for start in range(0, len(images), chunk_size):
+                chunk = range(start, min(start + chunk_size, len(images)))
+                uploads = await asyncio.gather(*(run_cpu(decode_batch_image, images[index][1]) for index in chunk))
+                for index in chunk:
+                    # From here only the chunk's decoded uploads reference the raw bytes
+                    images[index] = (images[index][0], None)
+                valid = [(index, upload) for index, upload in zip(chunk, uploads) if upload is not None]
+                del uploads
+                tensors = await asyncio.gather(*(
+                    run_cpu(disease_classifier.preprocess_image, upload.image) for _, upload in valid
+                ))
+                if not include_gradcam:
+                    # Bytes and decoded images are only needed again to render overlays
+                    valid = [(index, None) for index, _ in valid]
+
+                # Only the predicted class's CAM is rendered here
+                chunk_results = await asyncio.gather(*(
+                    scheduler.submit((tensor, None, 1) if include_gradcam else tensor) for tensor, _ in tensors
+                ))
+                if include_gradcam:
+                    chunk_predictions = [prediction for prediction, _ in chunk_results]
+                    gradcam_paths = await asyncio.gather(*(
+                        run_cpu(render_gradcam_file, upload, explanations[0]['cam'])
+                        for (_, upload), (_, explanations) in zip(valid, chunk_results)
+                    ))
+                else:
+                    chunk_predictions = chunk_results
+                    gradcam_paths = [None] * len(valid)
+
+                for (index, _), prediction, gradcam_path in zip(valid, chunk_predictions, gradcam_paths):
+                    results[index] = {
+                        'filename': images[index][0],
+                        'disease': prediction['disease'],
+                        'confidence': prediction['confidence'],
+                        'class_index': prediction['class_index'],
+                        'gradcam_image': f"/static/outputs/{Path(gradcam_path).name}" if gradcam_path else None
+                    }
+                predictions.extend(chunk_predictions)
+                del valid
+
+            weather_data = await weather_task
+        finally:
+            if not weather_task.done():
+                weather_task.cancel()
+
+        # Remedy and audio once per distinct disease
+        distinct_diseases = sorted({prediction['disease'] for prediction in predictions})
+
+        async def disease_report(disease):
+            risk_assessment = weather_service.assess_disease_risk(disease, weather_data)
+            remedy_text = await run_in_threadpool(
+                gemini_service.generate_disease_remedy, disease, weather_data
+            )
+            audio_url = await run_in_threadpool(
+                tts_service.create_comprehensive_audio, disease, remedy_text, risk_assessment, language
+            )
+            return {'risk_assessment': risk_assessment, 'remedy': remedy_text, 'audio_url': audio_url}
+
+        reports = await asyncio.gather(*(disease_report(disease) for disease in distinct_diseases))
+        disease_reports = dict(zip(distinct_diseases, reports))
+
+        print(f"✅ Batch analysis complete: {len(predictions)}/{len(images)} images, {len(distinct_diseases)} distinct diseases")
+
+        return JSONResponse(content={
+            'success': True,
+            'location': location,
+            'weather': weather_data,
+            'results': results,
+            'diseases': disease_reports,
+            'summary': summarize_field(results, disease_reports)
+        })
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise overloaded(e.retry_after)
+    except Exception as e:
+        print(f"❌ Error in batch disease detection: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
-    return JSONResponse(content={
-        'status': 'healthy',
+    """Health check endpoint
+
+    Returns 503 until the model is loaded and warmed up, so load balancers never
+    route traffic to a cold worker.
+    """
+    ready = disease_classifier is not None and runtime_ready
+    return JSONResponse(status_code=200 if ready else 503, content={
+        'status': 'healthy' if ready else 'warming_up',
+        'ready': ready,
+        'runtime_profile': {
+            key: runtime_profile[key]
+            for key in ('num_threads', 'num_interop_threads', 'batch_size', 'images_per_sec')
+        } if runtime_profile else None,
         'model_loaded': disease_classifier is not None,
-        'gradcam_ready': gradcam is not None
+        'gradcam_ready': gradcam is not None,
+        'inference_engine': disease_classifier.engine.name if disease_classifier is not None else None,
+        'inference_precision': disease_classifier.precision if disease_classifier is not None else None,
+        'inference_precision_extra_mb': (
+            round(disease_classifier.precision_extra_bytes / 1e6, 1) if disease_classifier is not None else None
+        ),
+        'batching': batch_scheduler.stats() if batch_scheduler is not None else None,
+        'gradcam_batching': gradcam_scheduler.stats() if gradcam_scheduler is not None else None,
+        'gradcam_cache': {'handles': gradcam_handles.stats(), 'cams': gradcam_cams.stats()},
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        # Don't let a health probe force-load a service that is still being preloaded
+        'remedy_cache': gemini_service.remedy_cache.stats() if gemini_service.loaded else None,
+        'weather_cache': weather_service.cache_stats() if weather_service.loaded else None,
+        'audio_cache': tts_service.audio_cache.stats() if tts_service.loaded else None,
+        'result_cache': result_cache.stats(),
+        'artifacts': janitor.stats(),
+        'profiling': request_profiler.stats(),
+        'startup': startup_timer.report(),
+        'worker': {'pid': os.getpid(), 'index': worker_index, 'memory': process_memory()},
+        'worker_group': worker_group_memory(prefork_parent_pid) if prefork_parent_pid else None
     })
 
+GRADCAM_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+async def gradcam_cams_for(gradcam_id, handle):
+    """Cached CAMs for a detection, computing them (once, even for concurrent viewers) on a miss"""
+    cams = gradcam_cams.get(gradcam_id)
+    if cams is not None:
+        return cams
+
+    pending = pending_cams.get(gradcam_id)
+    if pending is None:
+        pending = asyncio.ensure_future(compute_cams(handle['tensor'], handle['class_indices']))
+        pending_cams[gradcam_id] = pending
+        pending.add_done_callback(lambda _: pending_cams.pop(gradcam_id, None))
+
+    # Shielded so one viewer disconnecting doesn't cancel the computation for the others
+    _, explanations = await asyncio.shield(pending)
+    cams = {explanation['class_index']: explanation['cam'] for explanation in explanations}
+    gradcam_cams.set(gradcam_id, cams)
+    return cams
+
+async def compute_cams(image_tensor, class_indices):
+    with stage_seconds.time(stage='gradcam'):
+        return await gradcam_scheduler.submit((image_tensor, class_indices, len(class_indices)))
+
+def overlay_source(data):
+    """Decode upload bytes for overlay rendering (capped to GRADCAM_MAX_SIDE, not the model's scale)
+
+    Returns the image and the box of it the model saw, for placing the CAM.
+    """
+    image, _ = decode_downscaled(data, GRADCAM_MAX_SIDE)
+    return image, disease_classifier.input_region(*image.size)
+
+def render_gradcam(handle, cam, colormap, alpha):
+    """Encode an overlay from a handle"""
+    image, region = overlay_source(handle['data'])
+    return gradcam.render_overlay_bytes(image, cam, region=region, colormap=colormap, alpha=alpha)
+
+def render_gradcam_file(upload, cam):
+    """Write an overlay for an upload to static/outputs"""
+    image, region = overlay_source(upload.data)
+    path = gradcam.render_overlay(image, cam, str(STATIC_DIR / "outputs"), region=region, name=upload.id)
+    janitor.track('gradcam_outputs', path)
+    return path
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Stage latency histograms, cache, upstream error and queue metrics in Prometheus text format"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    """Summary of a captured request profile: time per stage, hottest functions and artifact links"""
+    if not request_profiler.can_view(request.headers, request.query_params):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    summary = await run_cpu(request_profiler.summary, profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    summary['artifact_urls'] = {name: f"/api/profiles/{profile_id}/{name}" for name in summary['artifacts']}
+    return JSONResponse(content=summary)
+
+@app.get("/api/profiles/{profile_id}/{artifact}")
+async def get_profile_artifact(profile_id: str, artifact: str, request: Request):
+    """Download a profile artifact: .pstats (cProfile) or .trace.json (Chrome trace, chrome://tracing or Perfetto)"""
+    if not request_profiler.can_view(request.headers, request.query_params):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path = request_profiler.artifact_path(profile_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile artifact not found")
+    janitor.touch('profiles', path)
+    media_type = "application/json" if artifact.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=artifact)
+
+@app.get("/api/gradcam/{gradcam_id}")
+async def get_gradcam(
+    gradcam_id: str,
+    request: Request,
+    class_index: int = None,
+    colormap: str = "red",
+    alpha: float = 0.3
+):
+    """Grad-CAM overlay for a detection, computed on first view
+
+    ``class_index`` defaults to the predicted class; the runner-up classes listed in
+    ``gradcam_topk`` are computed by the same pass. Re-renders with another
+    ``colormap`` or ``alpha`` reuse the cached CAM.
+    """
+    if not GRADCAM_ID_PATTERN.match(gradcam_id):
+        raise HTTPException(status_code=404, detail="Grad-CAM not found")
+    if colormap not in HEATMAP_COLORMAPS:
+        raise HTTPException(status_code=400, detail=f"colormap must be one of {', '.join(HEATMAP_COLORMAPS)}")
+    if not 0.0 <= alpha <= 1.0:
+        raise HTTPException(status_code=400, detail="alpha must be between 0 and 1")
+
+    handle = gradcam_handles.get(gradcam_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Grad-CAM expired, please analyze the image again")
+    if class_index is None:
+        class_index = handle['class_index']
+
+    etag = f'"{gradcam_id}-{class_index}-{colormap}-{alpha:g}"'
+    headers = {'ETag': etag, 'Cache-Control': f"private, max-age={GRADCAM_CACHE_TTL}"}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        cams = await gradcam_cams_for(gradcam_id, handle)
+    except QueueFullError as e:
+        raise overloaded(e.retry_after)
+
+    cam = cams.get(class_index)
+    if cam is None:
+        raise HTTPException(status_code=404, detail=f"Class {class_index} was not explained for this image")
+
+    with stage_seconds.time(stage='gradcam_render'):
+        image_bytes = await run_cpu(render_gradcam, handle, cam, colormap, alpha)
+    return Response(content=image_bytes, media_type=f"image/{GRADCAM_IMAGE_FORMAT}", headers=headers)
+
+def require_admin(request):
+    """Reject the request unless it carries ADMIN_TOKEN; admin endpoints don't exist without one"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get('x-greenlens-admin-token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.delete("/api/cache/remedies")
+async def invalidate_remedy_cache(request: Request, disease: str = None):
+    """Invalidate cached remedies for one disease (display name) or all diseases (admin token required)"""
+    require_admin(request)
+    removed = await run_in_threadpool(gemini_service.invalidate_remedies, disease)
+    return JSONResponse(content={'success': True, 'removed': removed, 'disease': disease})
+
+def parse_byte_range(range_header, file_size):
+    """Parse a single 'bytes=start-end' Range header into an inclusive (start, end) pair"""
+    match = re.match(r'^bytes=(\d*)-(\d*)$', range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+
+    if not match.group(1):
+        # Suffix range: the last N bytes
+        length = int(match.group(2))
+        if length == 0:
+            return None
+        return max(0, file_size - length), file_size - 1
+
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else file_size - 1
+    if start >= file_size or end < start:
+        return None
+    return start, min(end, file_size - 1)
+
+def iter_file_range(path, start, end, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@app.api_route("/static/audio/{name}", methods=["GET", "HEAD"])
+async def serve_audio(name: str, request: Request):
+    """Serve cached TTS audio with immutable caching and byte-range support"""
+    if not AUDIO_NAME_PATTERN.match(name):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    path = tts_service.audio_cache.path_for(name)
+    try:
+        file_size = path.stat().st_size
+    except OSError:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    tts_service.audio_cache.touch(name)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'ETag': f'"{name[:-4]}"'
+    }
+    if request.headers.get('if-none-match') == headers['ETag']:
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, file_size - 1, 200
+    range_header = request.headers.get('range')
+    if range_header:
+        byte_range = parse_byte_range(range_header, file_size)
+        if byte_range is None:
+            return Response(status_code=416, headers={'Content-Range': f'bytes */{file_size}'})
+        start, end = byte_range
+        status_code = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+
+    headers['Content-Length'] = str(end - start + 1)
+    if request.method == "HEAD" or file_size == 0:
+        return Response(status_code=status_code, headers=headers, media_type="audio/mpeg")
+
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type="audio/mpeg"
+    )
+
+class ArtifactStaticFiles(StaticFiles):
+    """StaticFiles that reports served Grad-CAM overlays to the janitor, so its eviction is least recently used"""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 206, 304) and Path(path).parent.name == "outputs":
+            janitor.touch('gradcam_outputs', path)
+        return response
+
 # Mount static files after API routes
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+app.mount("/static", ArtifactStaticFiles(directory=str(STATIC_DIR)), name="static")
+
+def tune_before_fork(workers):
+    """Autotune once, in a short-lived child, before any worker exists
+
+    Workers tuning on first boot would all time their candidates while the others
+    saturate the cores, and race to write the profile. The child keeps the parent
+    single-threaded for forking; workers then find the persisted profile.
+    """
+    from models.runtime import host_fingerprint, load_profile
+    fingerprint = host_fingerprint(disease_classifier, workers)
+    if load_profile(RUNTIME_PROFILE_PATH, fingerprint) is not None:
+        return
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            tune_runtime(fingerprint)
+            status = 0
+        except Exception as e:
+            print(f"⚠️  Autotuning failed: {e}")
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        print("⚠️  Workers will run with default thread and batch settings")
+
+def run_worker(index, sock, workers):
+    """Serve requests in a forked worker on the socket bound by the parent"""
+    global worker_index, prefork_parent_pid
+    import signal
+    import torch
+    from models.runtime import threads_per_worker
+
+    worker_index = index
+    prefork_parent_pid = os.getppid()
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+
+    # The parent ran single-threaded so no OpenMP pool was inherited; size this worker's share of the cores
+    torch.set_num_threads(threads_per_worker(workers))
+
+    print(f"👷 Worker {index} started (pid {os.getpid()})")
+    config = uvicorn.Config(app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+def log_worker_memory(children):
+    """Print resident memory of the parent and every worker"""
+    group = worker_group_memory(os.getpid())
+    print(f"🧠 Parent (pid {os.getpid()}): {format_memory(group['parent'])}")
+    for pid, index in sorted(children.items(), key=lambda item: item[1]):
+        print(f"🧠 Worker {index} (pid {pid}): {format_memory(group['workers'].get(str(pid)))}")
+    if group['total_pss_mb'] is not None:
+        print(f"🧠 Total PSS {group['total_pss_mb']:.0f} MB across {len(children)} workers "
+              f"(RSS sum {group['total_rss_mb']:.0f} MB)")
+
+def serve_prefork(workers):
+    """Load the model once, then fork workers that share its weights copy-on-write
+
+    Workers re-run the startup event for their own event loop, scheduler and API
+    clients but find the model already loaded. Crashed workers are replaced.
+    """
+    import gc
+    import signal
+    import torch
+
+    if torch.cuda.is_available():
+        print("⚠️  CUDA cannot be used across fork(); serving a single process instead")
+        uvicorn.run(app, host=HOST, port=PORT, log_level="info")
+        return
+
+    print(f"🍴 Prefork mode: loading the model once for {workers} workers")
+    # Keep the parent single-threaded so forked children don't inherit a dead OpenMP thread pool
+    torch.set_num_threads(1)
+    ensure_directories()
+    load_models()
+    if AUTOTUNE:
+        tune_before_fork(workers)
+
+    # Move everything allocated so far out of the collector's reach, so GC in the
+    # workers doesn't write to (and un-share) the pages holding these objects
+    gc.collect()
+    gc.freeze()
+
+    sock = uvicorn.Config(app, host=HOST, port=PORT).bind_socket()
+    children = {}
+    shutting_down = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(index, sock, workers)
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(workers):
+        spawn(index)
+    print(f"🌐 Access the application at: http://{HOST}:{PORT}")
+
+    next_report = time.monotonic() + min(60, MEMORY_REPORT_INTERVAL)
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            index = children.pop(pid, None)
+            if index is not None and not shutting_down:
+                print(f"⚠️  Worker {index} (pid {pid}) exited with status {status}, restarting")
+                time.sleep(1)  # don't spin if a worker keeps failing at startup
+                spawn(index)
+            continue
+
+        if MEMORY_REPORT_INTERVAL > 0 and time.monotonic() >= next_report and not shutting_down:
+            log_worker_memory(children)
+            next_report = time.monotonic() + MEMORY_REPORT_INTERVAL
+        time.sleep(0.5)
+
+    sock.close()
+    print("👋 All workers stopped")
 
 def main():
     """Run the application"""
     print("🌱 GreenLens - AI Crop Disease Detection")
     print("=" * 50)
+    if WEB_CONCURRENCY > 1 and PREFORK:
+        serve_prefork(WEB_CONCURRENCY)
+        return
     uvicorn.run(
         "main:app",
         host=HOST,
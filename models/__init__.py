@@ -1,6 +1,15 @@
+# Submodules import torch, so they are loaded on first attribute access rather than with the package
+_EXPORTS = {
+    "DiseaseClassifier": ".disease_classifier",
+    "GradCAM": ".gradcam",
+    "BatchScheduler": ".batch_scheduler",
+}
 
+__all__ = ["DiseaseClassifier", "GradCAM", "BatchScheduler"]
 
-from .disease_classifier import DiseaseClassifier
-from .gradcam import GradCAM
 
-__all__ = ["DiseaseClassifier", "GradCAM"]
+def __getattr__(name):
+    if name in _EXPORTS:
+        from importlib import import_module
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
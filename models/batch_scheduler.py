@@ -0,0 +1,227 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the scheduler's bounded queue has no room for another request"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Inference queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _PendingRequest:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item, future):
+        self.item = item
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Collect concurrent inference requests into micro-batches.
+
+    Requests submitted within ``max_wait_ms`` of the oldest pending request are
+    grouped (up to ``max_batch_size``) and handed to ``batch_fn`` as one list.
+    ``batch_fn`` runs in ``executor`` and must return one result per item.
+
+    At most ``max_concurrency`` batches run at once; while all slots are busy new
+    requests keep accumulating into the next batch. ``submit`` raises QueueFullError
+    once ``max_queue_depth`` requests are waiting (0 means unbounded).
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=10.0, executor=None,
+                 max_concurrency=1, max_queue_depth=0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue_depth = max(0, int(max_queue_depth))
+
+        self._pending = deque()
+        self._wakeup = None
+        self._worker = None
+        self._slots = None
+        self._running = {}  # executing task -> its batch
+        self._in_flight = 0
+
+        # Throughput / latency stats
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._batch_sizes = {}
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._batch_time_total = 0.0
+        self._rejected = 0
+        self._recent_waits = deque(maxlen=1000)
+
+    async def start(self):
+        """Start the background batching loop on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and fail any requests still waiting or running"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # Cancelling a running batch skips its result handling, so its requests are failed here
+        stopped = [request for batch in self._running.values() for request in batch]
+        for task in list(self._running):
+            task.cancel()
+
+        stopped.extend(self._pending)
+        self._pending.clear()
+        for request in stopped:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Batch scheduler stopped"))
+
+    async def submit(self, item):
+        """Queue one item for batched execution and wait for its result"""
+        await self.start()
+
+        if self.is_full:
+            self._rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingRequest(item, future))
+        self._submitted += 1
+        self._wakeup.set()
+
+        return await future
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def is_full(self):
+        return bool(self.max_queue_depth) and len(self._pending) >= self.max_queue_depth
+
+    def retry_after(self):
+        """Seconds until the current queue should have drained, from the observed batch time"""
+        avg_batch_time = self._batch_time_total / self._batches if self._batches else 1.0
+        batches_ahead = math.ceil(len(self._pending) / self.max_batch_size) + 1
+        return max(1, math.ceil(batches_ahead * avg_batch_time / self.max_concurrency))
+
+    def _wait_percentile(self, fraction):
+        if not self._recent_waits:
+            return 0.0
+        waits = sorted(self._recent_waits)
+        return waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000.0
+
+    def stats(self):
+        """Return queue depth and batch-size statistics"""
+        dispatched = sum(size * count for size, count in self._batch_sizes.items())
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'in_flight': self._in_flight,
+            'max_concurrency': self.max_concurrency,
+            'rejected': self._rejected,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'submitted': self._submitted,
+            'completed': self._completed,
+            'failed': self._failed,
+            'batches': self._batches,
+            'avg_batch_size': dispatched / self._batches if self._batches else 0.0,
+            'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+            'avg_queue_wait_ms': self._queue_wait_total / dispatched * 1000.0 if dispatched else 0.0,
+            'max_queue_wait_ms': self._queue_wait_max * 1000.0,
+            'p50_queue_wait_ms': self._wait_percentile(0.5),
+            'p95_queue_wait_ms': self._wait_percentile(0.95),
+            'avg_batch_time_ms': self._batch_time_total / self._batches * 1000.0 if self._batches else 0.0,
+        }
+
+    async def _run(self):
+        while True:
+            # Hold the batch open while every execution slot is busy
+            await self._slots.acquire()
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Wait for more requests until the batch is full or the oldest request's window closes
+            deadline = self._pending[0].enqueued_at + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                request = self._pending.popleft()
+                if not request.future.cancelled():
+                    batch.append(request)
+
+            if not batch:
+                self._slots.release()
+                continue
+
+            self._in_flight += len(batch)
+            task = asyncio.create_task(self._execute(batch))
+            self._running[task] = batch
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        self._running.pop(task, None)
+        self._slots.release()
+
+    async def _execute(self, batch):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        for request in batch:
+            wait = started - request.enqueued_at
+            self._queue_wait_total += wait
+            self._queue_wait_max = max(self._queue_wait_max, wait)
+            self._recent_waits.append(wait)
+
+        self._batches += 1
+        self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.batch_fn, [request.item for request in batch]
+            )
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            print(f"❌ Error running inference batch of {len(batch)}: {e}")
+            self._failed += len(batch)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            self._batch_time_total += time.perf_counter() - started
+            self._in_flight -= len(batch)
+
+        self._completed += len(batch)
+        for request, result in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(result)
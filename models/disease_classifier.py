@@ -1,3 +1,5 @@
+import os
+import threading
 import torch
 import torch.nn as nn
 import torchvision.transforms as transforms
@@ -5,81 +7,83 @@ from torchvision.models import efficientnet_b0
 from PIL import Image
 import numpy as np
 from pathlib import Path
-from config import MODEL_PATH, MODEL_INPUT_SIZE, NUM_CLASSES, DISEASE_CLASSES
+from config import (
+    MODEL_PATH, MODEL_MMAP_PATH, MODEL_INPUT_SIZE, MODEL_RESIZE_SIZE, NUM_CLASSES, DISEASE_CLASSES, INFERENCE_ENGINE, INFERENCE_PRECISION,
+    CALIBRATION_DIR
+)
+from models.engines import create_engine
+from models.precision import build_precision_engine, model_size_bytes, resident_bytes, verify_agreement
+from utils.image_utils import draft_for_short_side
+from utils.timing import startup_timer
+
+def build_transform():
+    """Preprocessing pipeline shared by the server, batch scans and worker processes"""
+    return transforms.Compose([
+        transforms.Resize(MODEL_RESIZE_SIZE),
+        transforms.CenterCrop(MODEL_INPUT_SIZE),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
 
 class DiseaseClassifier:
-    def __init__(self):
+    def __init__(self, engine=None, precision=None):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = None
+        self.engine = None
+        self.engine_name = engine or INFERENCE_ENGINE
+        self.precision = precision or INFERENCE_PRECISION
+        self.precision_extra_bytes = 0  # a quantized copy held next to the fp32 model
+
+        # Serializes model execution so hooks registered by Grad-CAM never see another caller's forward
+        self.model_lock = threading.RLock()
         
         # Enhanced preprocessing for better accuracy
-        self.transform = transforms.Compose([
-            transforms.Resize(256),
-            transforms.CenterCrop(MODEL_INPUT_SIZE),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
+        self.transform = build_transform()
         
         self.load_model()
 
+        # Forward-only classification may run through an exported engine; Grad-CAM keeps the eager model
+        self.engine = create_engine(self.engine_name, self.model, self.device)
+        self.apply_precision()
+
+    def build_architecture(self):
+        """EfficientNet-B0 with the classifier head resized to our number of classes"""
+        model = efficientnet_b0(weights=None)  # No pretrained weights
+        num_features = model.classifier[1].in_features
+        model.classifier[1] = nn.Linear(num_features, NUM_CLASSES)
+        return model
+
     def load_model(self):
-        """Load the pre-trained EfficientNet model"""
+        """Load the pre-trained EfficientNet model
+
+        The first boot converts the training checkpoint to a plain state dict at
+        MODEL_MMAP_PATH; later boots memory-map that file and assign its tensors
+        straight into a skeleton built on the meta device, skipping both the
+        random initialization and the copy of every weight.
+        """
         try:
-            # Check if model file exists
             model_path = Path(MODEL_PATH)
-            if not model_path.exists():
+            mmap_path = Path(MODEL_MMAP_PATH)
+            if not model_path.exists() and not mmap_path.exists():
                 raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
 
-            print(f"🔍 Loading model from: {model_path}")
-            
-            # Create EfficientNet-B0 model
-            self.model = efficientnet_b0(weights=None)  # No pretrained weights
-            
-            # Modify classifier for our number of classes
-            num_features = self.model.classifier[1].in_features
-            self.model.classifier[1] = nn.Linear(num_features, NUM_CLASSES)
-
-            # Load the trained weights
-            try:
-                # Try loading with map_location for cross-platform compatibility
-                checkpoint = torch.load(model_path, map_location=self.device, weights_only=False)
-                
-                # Handle different checkpoint formats
-                if isinstance(checkpoint, dict):
-                    if 'model_state_dict' in checkpoint:
-                        state_dict = checkpoint['model_state_dict']
-                        print("📊 Loading from model_state_dict")
-                    elif 'state_dict' in checkpoint:
-                        state_dict = checkpoint['state_dict']
-                        print("📊 Loading from state_dict")
-                    else:
-                        # Try to use the dict directly as state_dict
-                        state_dict = checkpoint
-                        print("📊 Loading checkpoint as state_dict")
-                else:
-                    # If it's the model directly (older torch.save format)
-                    if hasattr(checkpoint, 'state_dict'):
-                        state_dict = checkpoint.state_dict()
-                        print("📊 Extracting state_dict from model")
-                    else:
-                        raise ValueError("Unknown checkpoint format")
-
-                # Load state dict
-                missing_keys, unexpected_keys = self.model.load_state_dict(state_dict, strict=False)
-                
-                if missing_keys:
-                    print(f"⚠️  Missing keys: {missing_keys}")
-                if unexpected_keys:
-                    print(f"⚠️  Unexpected keys: {unexpected_keys}")
-
-                print(f"✅ Model loaded successfully from {model_path}")
-                
-            except Exception as e:
-                print(f"❌ Error loading model weights: {e}")
-                print("⚠️  Using randomly initialized model - predictions may be inaccurate")
+            model = None
+            if mmap_path.exists() and not self._mmap_is_stale(model_path, mmap_path):
+                try:
+                    with startup_timer.phase("model.load_mmap"):
+                        model = self.load_mmap_state_dict(mmap_path)
+                    print(f"✅ Model weights memory-mapped from {mmap_path}")
+                except Exception as e:
+                    print(f"⚠️  Could not memory-map {mmap_path}: {e}. Loading the checkpoint instead")
+
+            if model is None:
+                with startup_timer.phase("model.load_checkpoint"):
+                    model, loaded = self.load_checkpoint(model_path)
+                if loaded:
+                    self.save_mmap_state_dict(model, mmap_path)
 
             # Move model to device and set to evaluation mode
-            self.model.to(self.device)
+            self.model = model.to(self.device)
             self.model.eval()
             
             print(f"🎯 Model initialized on {self.device}")
@@ -88,10 +92,119 @@ class DiseaseClassifier:
             print(f"❌ Error loading model: {e}")
             raise
 
+    @staticmethod
+    def _mmap_is_stale(model_path, mmap_path):
+        return model_path.exists() and model_path.stat().st_mtime > mmap_path.stat().st_mtime
+
+    def load_mmap_state_dict(self, path):
+        """Build the model from a memory-mapped state dict without initializing weights first"""
+        state_dict = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+        with torch.device('meta'):
+            model = self.build_architecture()
+        model.load_state_dict(state_dict, strict=True, assign=True)
+        return model
+
+    def save_mmap_state_dict(self, model, path):
+        """Write a plain state dict next to the checkpoint for memory-mapped loading on later boots"""
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            state_dict = {key: tensor.detach().cpu().contiguous() for key, tensor in model.state_dict().items()}
+            torch.save(state_dict, tmp_path)
+            os.replace(tmp_path, path)
+            print(f"💾 Saved memory-mappable weights to {path}")
+        except Exception as e:
+            print(f"⚠️  Could not save memory-mappable weights: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def load_checkpoint(self, model_path):
+        """Load the training checkpoint; returns (model, loaded) where loaded is False on random init"""
+        print(f"🔍 Loading model from: {model_path}")
+        
+        # Create EfficientNet-B0 model
+        model = self.build_architecture()
+
+        # Load the trained weights
+        try:
+            # Try loading with map_location for cross-platform compatibility
+            checkpoint = torch.load(model_path, map_location=self.device, weights_only=False)
+            
+            # Handle different checkpoint formats
+            if isinstance(checkpoint, dict):
+                if 'model_state_dict' in checkpoint:
+                    state_dict = checkpoint['model_state_dict']
+                    print("📊 Loading from model_state_dict")
+                elif 'state_dict' in checkpoint:
+                    state_dict = checkpoint['state_dict']
+                    print("📊 Loading from state_dict")
+                else:
+                    # Try to use the dict directly as state_dict
+                    state_dict = checkpoint
+                    print("📊 Loading checkpoint as state_dict")
+            else:
+                # If it's the model directly (older torch.save format)
+                if hasattr(checkpoint, 'state_dict'):
+                    state_dict = checkpoint.state_dict()
+                    print("📊 Extracting state_dict from model")
+                else:
+                    raise ValueError("Unknown checkpoint format")
+
+            # Load state dict
+            missing_keys, unexpected_keys = model.load_state_dict(state_dict, strict=False)
+            
+            if missing_keys:
+                print(f"⚠️  Missing keys: {missing_keys}")
+            if unexpected_keys:
+                print(f"⚠️  Unexpected keys: {unexpected_keys}")
+
+            print(f"✅ Model loaded successfully from {model_path}")
+            return model, True
+            
+        except Exception as e:
+            print(f"❌ Error loading model weights: {e}")
+            print("⚠️  Using randomly initialized model - predictions may be inaccurate")
+            return model, False
+
+    def apply_precision(self):
+        """Swap in a reduced-precision engine, keeping fp32 if it disagrees with full precision"""
+        if self.precision == "fp32":
+            return
+        if self.engine.name != "eager":
+            print(f"⚠️  Precision '{self.precision}' only applies to the eager engine, keeping fp32")
+            self.precision = "fp32"
+            return
+
+        try:
+            engine = build_precision_engine(self.precision, self.model, self.device, self.transform)
+            passed, agreement = verify_agreement(self.model, engine, self.transform)
+            if agreement is None:
+                print(f"⚠️  No calibration images in {CALIBRATION_DIR} to verify {self.precision} against fp32, keeping fp32")
+                self.precision = "fp32"
+                return
+            if not passed:
+                print(f"⚠️  {self.precision} agrees with fp32 on only {agreement:.1%} of calibration images, keeping fp32")
+                self.precision = "fp32"
+                return
+            self.engine = engine
+            self.precision_extra_bytes = resident_bytes(self.model, engine) - model_size_bytes(self.model)
+            print(f"🔢 Using {self.precision} inference" + (
+                f" (+{self.precision_extra_bytes / 1e6:.1f} MB for the copy next to the fp32 model)"
+                if self.precision_extra_bytes else ""
+            ))
+        except Exception as e:
+            print(f"⚠️  Could not enable {self.precision} inference: {e}. Keeping fp32")
+            self.precision = "fp32"
+
     def preprocess_image(self, image_path):
-        """Preprocess image for model inference"""
+        """Preprocess image for model inference
+
+        Accepts a file path or an already decoded PIL image.
+        """
         try:
-            image = Image.open(image_path).convert('RGB')
+            if isinstance(image_path, Image.Image):
+                image = image_path if image_path.mode == 'RGB' else image_path.convert('RGB')
+            else:
+                with Image.open(image_path) as img:
+                    image = draft_for_short_side(img, MODEL_RESIZE_SIZE).convert('RGB')
             image_tensor = self.transform(image).unsqueeze(0)
             return image_tensor.to(self.device), image
         except Exception as e:
@@ -102,85 +215,133 @@ class DiseaseClassifier:
         """Predict disease class from image"""
         try:
             image_tensor, original_image = self.preprocess_image(image_path)
-            
-            with torch.no_grad():
-                outputs = self.model(image_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                confidence, predicted_class = torch.max(probabilities, 1)
-
-                # Get top predictions for better validation
-                top_probs, top_indices = torch.topk(probabilities, min(3, len(DISEASE_CLASSES)), dim=1)
-                
-                predicted_idx = top_indices[0][0].item()
-                confidence_score = top_probs[0][0].item()
-
-                # Ensure predicted class is within valid range
-                if predicted_idx >= len(DISEASE_CLASSES):
-                    predicted_idx = 0  # Default to first class if out of range
-
-                predicted_disease = DISEASE_CLASSES[predicted_idx]
-
-                # Add confidence validation to reduce hallucination
-                if confidence_score < 0.1:  # Very low confidence threshold
-                    # Check if any healthy class has higher probability
-                    healthy_indices = [i for i, name in enumerate(DISEASE_CLASSES) if 'healthy' in name.lower()]
-                    if healthy_indices:
-                        healthy_probs = [probabilities[0][i].item() for i in healthy_indices]
-                        max_healthy_prob = max(healthy_probs)
-                        if max_healthy_prob > confidence_score * 0.8:  # If healthy is competitive
-                            best_healthy_idx = healthy_indices[healthy_probs.index(max_healthy_prob)]
-                            predicted_disease = DISEASE_CLASSES[best_healthy_idx]
-                            predicted_idx = best_healthy_idx
-                            confidence_score = max_healthy_prob
-
-                # Clean up disease name for display
-                display_name = predicted_disease.replace('___', ' - ').replace('_', ' ')
-
-                return {
-                    'disease': display_name,
-                    'confidence': confidence_score,
-                    'class_index': predicted_idx,
-                    'all_probabilities': probabilities.cpu().numpy().tolist()[0]
-                }
+            return self.predict_batch([image_tensor])[0]
 
         except Exception as e:
             print(f"❌ Error during prediction: {e}")
             raise
 
-    def get_feature_maps(self, image_path):
-        """Get feature maps for Grad-CAM"""
+    def predict_batch(self, image_tensors):
+        """Predict disease classes for a list of preprocessed image tensors in one forward pass"""
         try:
-            image_tensor, _ = self.preprocess_image(image_path)
-            
-            # Hook to capture feature maps
-            feature_maps = []
-            def hook_fn(module, input, output):
-                feature_maps.append(output)
+            batch = torch.cat([tensor.to(self.device) for tensor in image_tensors], dim=0)
+
+            if self.engine.shares_model:
+                # The eager module is shared with Grad-CAM's hooks
+                with self.model_lock:
+                    outputs = self.engine(batch)
+            else:
+                outputs = self.engine(batch)
 
-            # Register hook on the last convolutional layer
-            last_conv_layer = None
-            for name, module in self.model.named_modules():
-                if isinstance(module, nn.Conv2d):
-                    last_conv_layer = module
+            probabilities = torch.nn.functional.softmax(outputs.float(), dim=1)
 
-            if last_conv_layer is None:
-                raise ValueError("No convolutional layer found in model")
+            return [self.format_prediction(row) for row in probabilities]
 
-            handle = last_conv_layer.register_forward_hook(hook_fn)
+        except Exception as e:
+            print(f"❌ Error during batch prediction: {e}")
+            raise
 
-            # Forward pass
-            with torch.no_grad():
-                outputs = self.model(image_tensor)
-                predicted_class = torch.argmax(outputs, dim=1)
+    def explain_batch(self, image_tensors, gradcam, top_k=3, class_indices=None):
+        """Classify a batch and compute Grad-CAMs for each image's top-k classes in one pass
 
-            # Remove hook
-            handle.remove()
+        The first explanation is always the reported prediction; the rest are the next
+        most probable classes. ``top_k`` may also be given per image. ``class_indices``
+        optionally gives, per image, the classes to explain instead (e.g. the ones an
+        earlier prediction listed), or None to rank them from this pass. Returns a list
+        of ``(prediction, explanations)`` where each explanation is a dict with disease,
+        class_index, confidence and cam.
+        """
+        try:
+            batch = torch.cat([tensor.to(self.device) for tensor in image_tensors], dim=0)
+            if isinstance(top_k, int):
+                top_k = [top_k] * len(image_tensors)
+            top_k = [max(1, min(k, len(DISEASE_CLASSES))) for k in top_k]
+            requested = class_indices or [None] * len(image_tensors)
+            predictions = []
+            selected = []
 
-            if not feature_maps:
-                raise ValueError("No feature maps captured")
+            def select_classes(probabilities):
+                for row, classes, k in zip(probabilities, requested, top_k):
+                    prediction = self.format_prediction(row)
+                    predictions.append(prediction)
+                    if classes is None:
+                        selected.append(self.top_classes(prediction, k))
+                    else:
+                        selected.append(self.class_entries(prediction, classes))
+                # generate_cams needs the same K for every image; shorter lists repeat their
+                # last class and the extra maps are dropped below
+                width = max(len(classes) for classes in selected)
+                return [
+                    [entry['class_index'] for entry in classes] + [classes[-1]['class_index']] * (width - len(classes))
+                    for classes in selected
+                ]
 
-            return feature_maps[0], predicted_class, image_tensor
+            _, cams = gradcam.generate_cams(batch, select_classes)
+            return [
+                (prediction, [dict(entry, cam=cams[row, k]) for k, entry in enumerate(classes)])
+                for row, (prediction, classes) in enumerate(zip(predictions, selected))
+            ]
 
         except Exception as e:
-            print(f"❌ Error getting feature maps: {e}")
+            print(f"❌ Error during fused prediction and Grad-CAM: {e}")
             raise
+
+    def top_classes(self, prediction, top_k):
+        """The predicted class followed by the next most probable ones, in the order explain_batch explains them"""
+        probabilities = prediction['all_probabilities']
+        ranked = sorted(range(len(probabilities)), key=lambda index: probabilities[index], reverse=True)
+        classes = [prediction['class_index']] + [
+            index for index in ranked if index != prediction['class_index']
+        ][:max(0, top_k - 1)]
+        return self.class_entries(prediction, classes)
+
+    def class_entries(self, prediction, classes):
+        """Disease name and probability of each of the given class indices"""
+        probabilities = prediction['all_probabilities']
+        return [
+            {'disease': self.display_name(index), 'class_index': index, 'confidence': probabilities[index]}
+            for index in classes
+        ]
+
+    @staticmethod
+    def display_name(class_index):
+        return DISEASE_CLASSES[class_index].replace('___', ' - ').replace('_', ' ')
+
+    def input_region(self, width, height):
+        """Box (left, top, right, bottom) of a width x height image that the model sees after Resize + CenterCrop"""
+        short_side = min(width, height)
+        side = short_side * MODEL_INPUT_SIZE / MODEL_RESIZE_SIZE
+        left = (width - side) / 2
+        top = (height - side) / 2
+        return (left, top, left + side, top + side)
+
+    def format_prediction(self, probabilities):
+        """Turn a 1-D probability tensor into the prediction dict returned by the API"""
+        # Get top predictions for better validation
+        top_probs, top_indices = torch.topk(probabilities, min(3, len(DISEASE_CLASSES)))
+
+        predicted_idx = top_indices[0].item()
+        confidence_score = top_probs[0].item()
+
+        # Ensure predicted class is within valid range
+        if predicted_idx >= len(DISEASE_CLASSES):
+            predicted_idx = 0  # Default to first class if out of range
+
+        # Add confidence validation to reduce hallucination
+        if confidence_score < 0.1:  # Very low confidence threshold
+            # Check if any healthy class has higher probability
+            healthy_indices = [i for i, name in enumerate(DISEASE_CLASSES) if 'healthy' in name.lower()]
+            if healthy_indices:
+                healthy_probs = [probabilities[i].item() for i in healthy_indices]
+                max_healthy_prob = max(healthy_probs)
+                if max_healthy_prob > confidence_score * 0.8:  # If healthy is competitive
+                    best_healthy_idx = healthy_indices[healthy_probs.index(max_healthy_prob)]
+                    predicted_idx = best_healthy_idx
+                    confidence_score = max_healthy_prob
+
+        return {
+            'disease': self.display_name(predicted_idx),
+            'confidence': confidence_score,
+            'class_index': predicted_idx,
+            'all_probabilities': probabilities.cpu().numpy().tolist()
+        }
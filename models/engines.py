@@ -0,0 +1,220 @@
+"""
+Inference engines for the disease classifier.
+
+The eager PyTorch model is always loaded (Grad-CAM needs autograd), but forward-only
+classification can run through a frozen TorchScript graph or ONNX Runtime instead.
+Artifacts are exported from the loaded weights and checked against eager logits
+before being used.
+
+Export manually with:
+    python -m models.engines --format all
+"""
+
+import argparse
+import contextlib
+import os
+from pathlib import Path
+
+import torch
+
+from config import MODEL_INPUT_SIZE, MODEL_PATH, TORCHSCRIPT_MODEL_PATH, ONNX_MODEL_PATH, ENGINE_PARITY_ATOL
+
+ENGINES = ("eager", "torchscript", "onnx")
+
+
+class EagerEngine:
+    """Run the eager nn.Module directly"""
+    name = "eager"
+    shares_model = True
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def __call__(self, batch):
+        with torch.no_grad():
+            return self.model(batch.to(self.device))
+
+
+class TorchScriptEngine:
+    """Run a frozen TorchScript graph"""
+    name = "torchscript"
+    shares_model = False
+
+    def __init__(self, path, device):
+        self.device = device
+        self.module = torch.jit.load(str(path), map_location=device)
+        self.module.eval()
+
+    def __call__(self, batch):
+        with torch.no_grad():
+            return self.module(batch.to(self.device))
+
+
+class OnnxEngine:
+    """Run an exported ONNX graph with ONNX Runtime on CPU"""
+    name = "onnx"
+    shares_model = False
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        inputs = batch.detach().cpu().contiguous().numpy()
+        logits = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(logits)
+
+
+def _example_input(batch_size=1):
+    return torch.randn(batch_size, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)
+
+
+@contextlib.contextmanager
+def _atomic_path(path):
+    """A per-process temporary path that replaces ``path`` once the block succeeds
+
+    Another worker loading the artifact meanwhile sees the old file or the complete
+    new one, never a partial write.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def export_torchscript(model, path=TORCHSCRIPT_MODEL_PATH):
+    """Trace, freeze and save the model as TorchScript"""
+    model = model.eval().cpu()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, _example_input())
+        frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    with _atomic_path(path) as tmp_path:
+        frozen.save(str(tmp_path))
+    print(f"✅ Exported TorchScript model to {path}")
+    return path
+
+
+def export_onnx(model, path=ONNX_MODEL_PATH):
+    """Export the model to ONNX with a dynamic batch dimension"""
+    model = model.eval().cpu()
+    with torch.no_grad(), _atomic_path(path) as tmp_path:
+        torch.onnx.export(
+            model,
+            _example_input(),
+            str(tmp_path),
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17
+        )
+    print(f"✅ Exported ONNX model to {path}")
+    return path
+
+
+def check_parity(model, engine, batch_size=4, atol=ENGINE_PARITY_ATOL, seed=0):
+    """Compare an engine's logits with eager execution on a random batch"""
+    generator = torch.Generator().manual_seed(seed)
+    batch = torch.randn(batch_size, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, generator=generator)
+    device = next(model.parameters()).device
+
+    with torch.no_grad():
+        expected = model.eval()(batch.to(device)).float().cpu()
+    actual = engine(batch).float().cpu()
+
+    max_abs_diff = (expected - actual).abs().max().item()
+    top1_agreement = (expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean().item()
+    return {
+        'engine': engine.name,
+        'max_abs_diff': max_abs_diff,
+        'top1_agreement': top1_agreement,
+        'atol': atol,
+        'passed': max_abs_diff <= atol and top1_agreement == 1.0
+    }
+
+
+def _is_stale(artifact_path):
+    """An exported artifact is stale when missing or older than the source weights"""
+    artifact_path = Path(artifact_path)
+    if not artifact_path.exists():
+        return True
+    source = Path(MODEL_PATH)
+    return source.exists() and source.stat().st_mtime > artifact_path.stat().st_mtime
+
+
+def create_engine(name, model, device):
+    """Build the configured engine, exporting artifacts as needed
+
+    Falls back to eager execution if the engine cannot be built or fails the parity check.
+    """
+    name = (name or "eager").lower()
+    if name not in ENGINES:
+        print(f"⚠️  Unknown inference engine '{name}', using eager")
+        name = "eager"
+    if name == "eager":
+        return EagerEngine(model, device)
+
+    try:
+        if name == "torchscript":
+            if _is_stale(TORCHSCRIPT_MODEL_PATH):
+                export_torchscript(model, TORCHSCRIPT_MODEL_PATH)
+                model.to(device)
+            engine = TorchScriptEngine(TORCHSCRIPT_MODEL_PATH, device)
+        else:
+            if _is_stale(ONNX_MODEL_PATH):
+                export_onnx(model, ONNX_MODEL_PATH)
+                model.to(device)
+            engine = OnnxEngine(ONNX_MODEL_PATH)
+
+        parity = check_parity(model, engine)
+        if not parity['passed']:
+            print(f"⚠️  {name} engine failed parity check ({parity}), using eager")
+            return EagerEngine(model, device)
+
+        print(f"⚡ Using {name} inference engine (max |Δlogit| {parity['max_abs_diff']:.2e})")
+        return engine
+
+    except Exception as e:
+        print(f"⚠️  Could not initialize {name} engine: {e}. Using eager")
+        return EagerEngine(model, device)
+
+
+def main():
+    from models.disease_classifier import DiseaseClassifier
+
+    parser = argparse.ArgumentParser(description="Export GreenLens model weights to TorchScript / ONNX")
+    parser.add_argument('--format', choices=("torchscript", "onnx", "all"), default="all")
+    parser.add_argument('--atol', type=float, default=ENGINE_PARITY_ATOL, help="Max allowed logit difference")
+    args = parser.parse_args()
+
+    classifier = DiseaseClassifier(engine="eager", precision="fp32")
+    formats = ("torchscript", "onnx") if args.format == "all" else (args.format,)
+    failed = False
+
+    for fmt in formats:
+        if fmt == "torchscript":
+            export_torchscript(classifier.model, TORCHSCRIPT_MODEL_PATH)
+            engine = TorchScriptEngine(TORCHSCRIPT_MODEL_PATH, torch.device('cpu'))
+        else:
+            export_onnx(classifier.model, ONNX_MODEL_PATH)
+            engine = OnnxEngine(ONNX_MODEL_PATH)
+
+        parity = check_parity(classifier.model.cpu(), engine, atol=args.atol)
+        status = "✅" if parity['passed'] else "❌"
+        print(f"{status} {fmt}: max |Δlogit| {parity['max_abs_diff']:.2e}, top-1 agreement {parity['top1_agreement']:.0%}")
+        failed = failed or not parity['passed']
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
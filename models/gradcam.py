@@ -1,14 +1,17 @@
 import torch
 import torch.nn.functional as F
-import cv2
 import numpy as np
 from PIL import Image
 import os
-from utils.image_utils import save_image
+import threading
+from utils.image_utils import save_image, render_heatmap_overlay, encode_image
+from config import GRADCAM_MAX_SIDE, GRADCAM_IMAGE_FORMAT, GRADCAM_IMAGE_QUALITY
 
 class GradCAM:
-    def __init__(self, model):
+    def __init__(self, model, model_lock=None):
         self.model = model
+        # Share the classifier's lock so hooks never capture a concurrent forward pass
+        self.model_lock = model_lock or threading.RLock()
         self.gradients = None
         self.activations = None
         self.hooks = []
@@ -21,9 +24,8 @@ class GradCAM:
         """Save activations during forward pass"""
         self.activations = output
         
-    def register_hooks(self):
-        """Register forward and backward hooks"""
-        # Find the last convolutional layer
+    def find_target_layer(self):
+        """The last convolutional layer of the model"""
         target_layer = None
         for name, module in self.model.named_modules():
             if isinstance(module, torch.nn.Conv2d):
@@ -31,6 +33,12 @@ class GradCAM:
         
         if target_layer is None:
             raise ValueError("No convolutional layer found in model")
+        return target_layer
+
+    def register_hooks(self):
+        """Register forward and backward hooks"""
+        # Find the last convolutional layer
+        target_layer = self.find_target_layer()
         
         # Register forward hook
         forward_hook = target_layer.register_forward_hook(self.save_activation)
@@ -52,86 +60,129 @@ class GradCAM:
     def generate_cam(self, image_tensor, class_idx=None):
         """Generate Class Activation Map"""
         try:
-            self.model.eval()
-            
-            # Register hooks
-            target_layer = self.register_hooks()
-            
-            # Ensure image tensor requires grad
-            image_tensor.requires_grad_(True)
-            
-            # Forward pass
-            model_output = self.model(image_tensor)
-            
-            if class_idx is None:
-                class_idx = torch.argmax(model_output, dim=1).item()
-            
-            # Zero gradients
-            self.model.zero_grad()
-            
-            # Backward pass
-            class_score = model_output[:, class_idx]
-            class_score.backward(retain_graph=True)
-            
-            # Generate CAM
-            if self.gradients is None or self.activations is None:
-                raise ValueError("Gradients or activations not captured")
-            
-            # Get gradients and activations
-            gradients = self.gradients
-            activations = self.activations
-            
-            # Global average pooling of gradients
-            weights = torch.mean(gradients, dim=(2, 3), keepdim=True)
-            
-            # Weight the activations
-            cam = torch.sum(weights * activations, dim=1, keepdim=True)
-            
-            # Apply ReLU
-            cam = F.relu(cam)
-            
-            # Normalize
-            if torch.max(cam) > 0:
-                cam = cam / torch.max(cam)
-            
-            # Remove hooks
-            self.remove_hooks()
-            
-            return cam.squeeze().detach().cpu().numpy()
-            
+            def select_classes(probabilities):
+                if class_idx is None:
+                    return torch.argmax(probabilities, dim=1).tolist()
+                return [class_idx] * probabilities.shape[0]
+
+            _, cams = self.generate_cam_batch(image_tensor, select_classes)
+            return cams[0]
+
         except Exception as e:
-            self.remove_hooks()
             print(f"Error generating Grad-CAM: {e}")
             # Return a default heatmap if generation fails
             return np.random.rand(224, 224) * 0.5
-    
-    def overlay_heatmap(self, image_path, cam, output_path):
-        """Overlay heatmap on original image"""
+
+    def generate_cam_batch(self, image_tensor, select_classes):
+        """Run one forward pass and derive both probabilities and Grad-CAMs from it
+
+        ``select_classes`` receives the softmax probabilities of the batch and returns
+        the class index to explain for each image. Returns ``(probabilities, cams)``
+        where ``cams`` is an ``(N, H, W)`` array normalised to [0, 1] per image.
+        """
+        def select_one(probabilities):
+            return [[class_index] for class_index in select_classes(probabilities)]
+
+        probabilities, cams = self.generate_cams(image_tensor, select_one)
+        return probabilities, cams[:, 0]
+
+    def generate_cams(self, image_tensor, select_classes):
+        """Grad-CAMs for several classes per image from a single forward pass
+
+        ``select_classes`` receives the softmax probabilities of the batch and returns,
+        for each image, the same number K of class indices to explain. Returns
+        ``(probabilities, cams)`` where ``cams`` is an ``(N, K, H, W)`` array
+        normalised to [0, 1] per map.
+        """
+        with self.model_lock:
+            return self._generate_cams(image_tensor, select_classes)
+
+    def _generate_cams(self, image_tensor, select_classes):
         try:
-            # Load original image using PIL
-            original_image = Image.open(image_path).convert('RGB')
-            original_array = np.array(original_image)
-            
-            # Ensure cam is 2D
-            if len(cam.shape) > 2:
-                cam = cam.squeeze()
-            
-            # Resize CAM to match original image using PIL
-            cam_image = Image.fromarray((cam * 255).astype(np.uint8), mode='L')
-            cam_resized = cam_image.resize((original_array.shape[1], original_array.shape[0]))
-            cam_array = np.array(cam_resized).astype(np.float32) / 255.0
-            
-            # Create a simple red heatmap overlay
-            heatmap = np.zeros_like(original_array)
-            heatmap[:, :, 0] = cam_array * 255  # Red channel for heat
-            
-            # Create overlay
-            overlay = original_array * 0.7 + heatmap * 0.3
-            overlay = np.clip(overlay, 0, 255).astype(np.uint8)
+            self.model.eval()
+
+            # Only the activations are needed; gradients are taken with respect to them directly
+            self.hooks = [self.find_target_layer().register_forward_hook(self.save_activation)]
+
+            with torch.enable_grad():
+                # Forward pass with activations captured
+                model_output = self.model(image_tensor)
+                probabilities = F.softmax(model_output, dim=1).detach()
+
+                class_indices = torch.as_tensor(
+                    select_classes(probabilities), dtype=torch.long, device=model_output.device
+                )
+                if class_indices.dim() != 2 or class_indices.shape[0] != model_output.shape[0]:
+                    raise ValueError("select_classes must return the same number of classes for every image")
+                if self.activations is None:
+                    raise ValueError("Activations not captured")
+
+                # (N, K) scores; images are independent in eval mode, so the gradient of
+                # column k's sum gives every image's gradient for its k-th class
+                scores = model_output.gather(1, class_indices)
+                gradients = self._score_gradients(scores, self.activations)
+
+            # Global average pooling of gradients: (N, K, C, 1, 1)
+            weights = torch.mean(gradients, dim=(3, 4), keepdim=True)
+
+            # Weight the activations and apply ReLU: (N, K, H, W)
+            cams = F.relu(torch.sum(weights * self.activations.detach().unsqueeze(1), dim=2))
+
+            # Normalize each map independently
+            maxima = cams.flatten(2).max(dim=2).values[..., None, None]
+            cams = torch.where(maxima > 0, cams / maxima.clamp_min(1e-12), cams)
+
+            return probabilities, cams.cpu().numpy()
+
+        finally:
+            self.remove_hooks()
+            self.gradients = None
+            self.activations = None
+
+    @staticmethod
+    def _score_gradients(scores, activations):
+        """d scores[:, k] / d activations for every k, as an (N, K, C, H, W) tensor
+
+        All K backward passes (which stop at the target layer) run as one vectorized
+        call; models with ops vmap cannot batch fall back to one pass per class.
+        """
+        num_classes = scores.shape[1]
+        if num_classes == 1:
+            (gradients,) = torch.autograd.grad(scores.sum(), activations)
+            return gradients.unsqueeze(1)
+
+        one_hot = torch.eye(num_classes, dtype=scores.dtype, device=scores.device)
+        grad_outputs = one_hot[:, None, :].expand(num_classes, scores.shape[0], num_classes)
+        try:
+            (gradients,) = torch.autograd.grad(
+                scores, activations, grad_outputs=grad_outputs, retain_graph=True, is_grads_batched=True
+            )
+        except (RuntimeError, NotImplementedError):
+            gradients = torch.stack([
+                torch.autograd.grad(scores[:, k].sum(), activations, retain_graph=True)[0]
+                for k in range(num_classes)
+            ])
+        return gradients.transpose(0, 1)
+
+    def compose_overlay(self, image, cam, region=None, colormap='red', alpha=0.3, max_side=GRADCAM_MAX_SIDE):
+        """Blend a CAM onto an image (capped to ``max_side``) and return the overlay as a PIL image
+
+        ``region`` is the ``(left, top, right, bottom)`` box of the original image the
+        model actually saw; the CAM is placed there instead of stretched over the image.
+        """
+        return render_heatmap_overlay(image, cam, region=region, colormap=colormap, alpha=alpha, max_side=max_side)
+
+    def overlay_heatmap(self, image_path, cam, output_path, region=None):
+        """Overlay heatmap on original image
+
+        ``image_path`` may also be an already decoded PIL image or RGB ndarray.
+        """
+        try:
+            overlay = self.compose_overlay(image_path, cam, region=region)
             
             # Save overlay image
-            overlay_image = Image.fromarray(overlay)
-            overlay_image.save(output_path)
+            with open(output_path, 'wb') as f:
+                f.write(encode_image(overlay, GRADCAM_IMAGE_FORMAT, GRADCAM_IMAGE_QUALITY))
             
             return output_path
             
@@ -139,54 +190,32 @@ class GradCAM:
             print(f"Error creating overlay: {e}")
             # Create a simple copy of original image if overlay fails
             try:
-                original_image = Image.open(image_path)
+                if isinstance(image_path, np.ndarray):
+                    original_image = Image.fromarray(image_path)
+                elif isinstance(image_path, Image.Image):
+                    original_image = image_path
+                else:
+                    original_image = Image.open(image_path)
                 original_image.save(output_path)
                 return output_path
             except:
                 return None
+
+    def render_overlay_bytes(self, image, cam, region=None, colormap='red', alpha=0.3):
+        """Encode the overlay for a CAM (GRADCAM_IMAGE_FORMAT) without touching the filesystem"""
+        overlay = self.compose_overlay(image, cam, region, colormap, alpha)
+        return encode_image(overlay, GRADCAM_IMAGE_FORMAT, GRADCAM_IMAGE_QUALITY)
     
-    def generate_gradcam_image(self, image_path, output_dir, class_idx=None):
-        """Generate complete Grad-CAM visualization"""
-        try:
-            # Create output directory if it doesn't exist
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Preprocess image
-            image = Image.open(image_path).convert('RGB')
-            
-            # We'll use F.interpolate directly instead of Sequential
-            
-            # Convert PIL image to tensor
-            image_array = np.array(image)
-            image_tensor = torch.tensor(image_array).permute(2, 0, 1).float().unsqueeze(0)
-            
-            # Normalize to 0-1 range
-            image_tensor = image_tensor / 255.0
-            
-            # Resize to model input size
-            image_tensor = F.interpolate(image_tensor, size=(224, 224), mode='bilinear', align_corners=False)
-            
-            # Apply ImageNet normalization
-            mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
-            std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
-            image_tensor = (image_tensor - mean) / std
-            
-            # Move to device
-            image_tensor = image_tensor.to(next(self.model.parameters()).device)
-            
-            # Generate CAM
-            cam = self.generate_cam(image_tensor, class_idx)
-            
-            # Create output filename
-            base_name = os.path.splitext(os.path.basename(image_path))[0]
-            output_path = os.path.join(output_dir, f"{base_name}_gradcam.jpg")
-            
-            # Create overlay
-            overlay_path = self.overlay_heatmap(image_path, cam, output_path)
-            
-            return overlay_path
-            
-        except Exception as e:
-            print(f"Error generating Grad-CAM image: {e}")
-            # Return None if generation fails
-            return None
+    def render_overlay(self, image_path, cam, output_dir, region=None, name=None):
+        """Save the overlay for an already computed CAM into output_dir
+
+        ``name`` is required when ``image_path`` is a decoded image rather than a file.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Create output filename
+        base_name = name or os.path.splitext(os.path.basename(image_path))[0]
+        extension = "webp" if GRADCAM_IMAGE_FORMAT == "webp" else "jpg"
+        output_path = os.path.join(output_dir, f"{base_name}_gradcam.{extension}")
+
+        return self.overlay_heatmap(image_path, cam, output_path, region=region)
@@ -0,0 +1,133 @@
+"""
+Out-of-process model execution.
+
+Each inference worker is a spawned process holding its own DiseaseClassifier and
+Grad-CAM, so forward and backward passes never compete with the event loop (or its
+GIL) for the server process. Batches travel as numpy arrays; weights memory-mapped
+from MODEL_MMAP_PATH are shared between workers through the page cache.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+_classifier = None
+_gradcam = None
+
+
+def _init_worker(num_threads, warmup_iterations, top_k):
+    """Load the model once per worker process"""
+    global _classifier, _gradcam
+    import torch
+    from models.disease_classifier import DiseaseClassifier
+    from models.gradcam import GradCAM
+    from models.runtime import warm_up
+
+    torch.set_num_threads(num_threads)
+    _classifier = DiseaseClassifier()
+    _gradcam = GradCAM(_classifier.model, model_lock=_classifier.model_lock)
+    if warmup_iterations:
+        warm_up(_classifier, _gradcam, iterations=warmup_iterations, top_k=top_k)
+
+
+def _to_tensors(arrays):
+    import torch
+    return [torch.from_numpy(array) for array in arrays]
+
+
+def _predict_batch(arrays):
+    return _classifier.predict_batch(_to_tensors(arrays))
+
+
+def _explain_batch(arrays, top_k, class_indices):
+    return _classifier.explain_batch(_to_tensors(arrays), _gradcam, top_k=top_k, class_indices=class_indices)
+
+
+def _worker_info():
+    import torch
+    return {
+        'pid': os.getpid(),
+        'engine': _classifier.engine.name,
+        'precision': _classifier.precision,
+        'num_threads': torch.get_num_threads(),
+    }
+
+
+class InferencePool(Executor):
+    """Process pool running classifier batches, with the classifier's batch API
+
+    A worker that dies (OOM kill, segfault) breaks a ProcessPoolExecutor for good;
+    the pool is then rebuilt on the next submission and only the batches that were
+    running on it fail. Workers are spawned on first use, so ``num_threads`` may be
+    changed (e.g. to the autotuned value) until then.
+    """
+
+    def __init__(self, workers, num_threads=1, warmup_iterations=1, top_k=1):
+        self.workers = max(1, int(workers))
+        self.num_threads = max(1, int(num_threads))
+        self.warmup_iterations = warmup_iterations
+        self.top_k = top_k
+        self.restarts = 0
+        self.worker_info = []
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.num_threads, self.warmup_iterations, self.top_k)
+        )
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            try:
+                return self._executor.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                print("⚠️  An inference worker died, restarting the inference pool")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+                self.restarts += 1
+                return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def start(self):
+        """Spawn the workers and block until each has loaded and warmed up its model"""
+        futures = [self.submit(_worker_info) for _ in range(self.workers)]
+        info = {}
+        for future in futures:
+            worker = future.result()
+            info[worker['pid']] = worker
+        self.worker_info = list(info.values())
+        return self.worker_info
+
+    @staticmethod
+    def _arrays(image_tensors):
+        return [np.ascontiguousarray(tensor.detach().cpu().numpy()) for tensor in image_tensors]
+
+    def predict_batch(self, image_tensors):
+        """Classify a batch in a worker process (blocking)"""
+        return self.submit(_predict_batch, self._arrays(image_tensors)).result()
+
+    def explain_batch(self, image_tensors, gradcam=None, top_k=3, class_indices=None):
+        """Classify a batch with top-k (or the given classes') Grad-CAM explanations in a worker process (blocking)"""
+        return self.submit(_explain_batch, self._arrays(image_tensors), top_k, class_indices).result()
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'threads_per_worker': self.num_threads,
+            'restarts': self.restarts,
+            'ready_workers': len(self.worker_info),
+        }
@@ -0,0 +1,277 @@
+"""
+Reduced-precision CPU inference for the disease classifier.
+
+Modes:
+    fp32          - full precision (default)
+    int8_dynamic  - dynamic post-training quantization of the Linear head; EfficientNet-B0's
+                    time and weights are almost all in its convolutions, so expect little effect
+    int8_static   - static post-training quantization (FX graph mode) calibrated on sample images
+    bf16          - bfloat16 autocast
+
+The int8 modes run a quantized copy of the model while the fp32 model stays loaded for
+Grad-CAM, so they add that copy's size to memory rather than saving it.
+
+Measure the effect on diagnoses before enabling a mode:
+    python -m models.precision --mode int8_static --data /path/to/labelled --calibration /path/to/samples
+where the labelled folder holds one sub-directory per DISEASE_CLASSES entry.
+"""
+
+import argparse
+import copy
+import json
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from PIL import Image
+
+from config import (
+    DISEASE_CLASSES, MODEL_INPUT_SIZE, MODEL_RESIZE_SIZE, CALIBRATION_DIR, CALIBRATION_MAX_IMAGES,
+    PRECISION_MIN_AGREEMENT
+)
+from utils.image_utils import draft_for_short_side
+
+PRECISION_MODES = ("fp32", "int8_dynamic", "int8_static", "bf16")
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+
+class QuantizedEngine:
+    """Run a separately quantized copy of the model (never shared with Grad-CAM)"""
+    shares_model = False
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+
+    def __call__(self, batch):
+        with torch.no_grad():
+            return self.module(batch.cpu())
+
+
+class Bf16Engine:
+    """Run the eager model under bfloat16 autocast"""
+    name = "bf16"
+    shares_model = True
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def __call__(self, batch):
+        with torch.no_grad(), torch.autocast(device_type=self.device.type, dtype=torch.bfloat16):
+            return self.model(batch.to(self.device)).float()
+
+
+def list_images(folder, limit=None):
+    """Image files under folder in a stable order"""
+    paths = sorted(
+        path for path in Path(folder).rglob('*')
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+    return paths[:limit] if limit else paths
+
+
+def load_batches(paths, transform, batch_size=8):
+    """Yield preprocessed batches of the given image paths"""
+    batch = []
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                # Same reduced-scale decode as serving, so calibration sees what requests see
+                batch.append(transform(draft_for_short_side(img, MODEL_RESIZE_SIZE).convert('RGB')))
+        except Exception as e:
+            print(f"⚠️  Skipping unreadable image {path}: {e}")
+            continue
+        if len(batch) == batch_size:
+            yield torch.stack(batch)
+            batch = []
+    if batch:
+        yield torch.stack(batch)
+
+
+def quantize_dynamic(model):
+    """INT8 dynamic quantization; only the Linear classifier head has a dynamic kernel
+
+    The convolutions stay fp32, so this is barely faster or smaller than fp32, and the
+    copy is held next to the fp32 model.
+    """
+    module = copy.deepcopy(model).cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model, calibration_batches):
+    """INT8 static post-training quantization using FX graph mode"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    backend = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = backend
+
+    module = copy.deepcopy(model).cpu().eval()
+    example_inputs = (torch.randn(1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE),)
+    prepared = prepare_fx(module, get_default_qconfig_mapping(backend), example_inputs)
+
+    calibrated = 0
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+            calibrated += batch.shape[0]
+    if calibrated == 0:
+        raise ValueError("No calibration images available for static quantization")
+
+    print(f"📏 Calibrated static quantization on {calibrated} images")
+    return convert_fx(prepared)
+
+
+def build_precision_engine(mode, model, device, transform, calibration_dir=CALIBRATION_DIR):
+    """Build a reduced-precision engine for the given mode, or None for fp32"""
+    if mode == "fp32":
+        return None
+    if mode not in PRECISION_MODES:
+        raise ValueError(f"Unknown precision mode '{mode}'")
+    if mode == "bf16":
+        return Bf16Engine(model, device)
+    if device.type != 'cpu':
+        raise ValueError("INT8 quantization is only supported on CPU")
+
+    if mode == "int8_dynamic":
+        return QuantizedEngine(quantize_dynamic(model), mode)
+
+    paths = list_images(calibration_dir, CALIBRATION_MAX_IMAGES) if Path(calibration_dir).is_dir() else []
+    return QuantizedEngine(quantize_static(model, load_batches(paths, transform)), mode)
+
+
+def top1(engine_or_model, batch):
+    with torch.no_grad():
+        return engine_or_model(batch).float().argmax(dim=1).cpu()
+
+
+def agreement_with_fp32(model, engine, batches):
+    """Fraction of images where the reduced-precision engine agrees with fp32 top-1"""
+    agree = total = 0
+    device = next(model.parameters()).device
+    for batch in batches:
+        reference = top1(model.eval(), batch.to(device))
+        candidate = top1(engine, batch)
+        agree += (reference == candidate).sum().item()
+        total += batch.shape[0]
+    return agree / total if total else None
+
+
+def verify_agreement(model, engine, transform, calibration_dir=CALIBRATION_DIR,
+                     min_agreement=PRECISION_MIN_AGREEMENT):
+    """Check a reduced-precision engine against fp32 on the calibration images
+
+    Returns (passed, agreement). Without images to check against, agreement is None and
+    the engine does not pass; an unverified mode could silently change diagnoses.
+    """
+    if not Path(calibration_dir).is_dir():
+        return False, None
+    paths = list_images(calibration_dir, CALIBRATION_MAX_IMAGES)
+    agreement = agreement_with_fp32(model, engine, load_batches(paths, transform))
+    if agreement is None:
+        return False, None
+    return agreement >= min_agreement, agreement
+
+
+def model_size_bytes(module):
+    """Approximate in-memory size of a module's parameters and buffers"""
+    total = 0
+    for tensor in list(module.state_dict().values()):
+        if isinstance(tensor, torch.Tensor):
+            total += tensor.numel() * tensor.element_size()
+        elif isinstance(tensor, tuple):
+            # Packed quantized Linear params
+            total += sum(t.numel() * t.element_size() for t in tensor if isinstance(t, torch.Tensor))
+    return total
+
+
+def resident_bytes(model, engine):
+    """Parameter memory of the fp32 model plus any separate copy an engine keeps loaded"""
+    fp32 = model_size_bytes(model)
+    if engine is None or getattr(engine, 'shares_model', True):
+        return fp32
+    return fp32 + model_size_bytes(engine.module)
+
+
+def accuracy_report(model, engine, transform, labelled_dir, batch_size=16):
+    """Per-class top-1 agreement with fp32 and accuracy of both against folder labels"""
+    device = next(model.parameters()).device
+    per_class = {}
+
+    for class_index, class_name in enumerate(DISEASE_CLASSES):
+        class_dir = Path(labelled_dir) / class_name
+        if not class_dir.is_dir():
+            continue
+
+        stats = {'images': 0, 'agreement': 0, 'fp32_correct': 0, 'reduced_correct': 0}
+        for batch in load_batches(list_images(class_dir), transform, batch_size):
+            reference = top1(model.eval(), batch.to(device))
+            candidate = top1(engine, batch)
+            stats['images'] += batch.shape[0]
+            stats['agreement'] += (reference == candidate).sum().item()
+            stats['fp32_correct'] += (reference == class_index).sum().item()
+            stats['reduced_correct'] += (candidate == class_index).sum().item()
+
+        if stats['images']:
+            per_class[class_name] = {
+                'images': stats['images'],
+                'top1_agreement': stats['agreement'] / stats['images'],
+                'fp32_accuracy': stats['fp32_correct'] / stats['images'],
+                'reduced_accuracy': stats['reduced_correct'] / stats['images'],
+            }
+
+    images = sum(row['images'] for row in per_class.values())
+    overall = {
+        key: sum(row[key] * row['images'] for row in per_class.values()) / images if images else None
+        for key in ('top1_agreement', 'fp32_accuracy', 'reduced_accuracy')
+    }
+    overall['images'] = images
+    return {'per_class': per_class, 'overall': overall}
+
+
+def main():
+    from models.disease_classifier import DiseaseClassifier
+
+    parser = argparse.ArgumentParser(description="Accuracy regression report for reduced-precision inference")
+    parser.add_argument('--mode', choices=PRECISION_MODES[1:], required=True)
+    parser.add_argument('--data', required=True, help="Labelled folder with one sub-directory per class")
+    parser.add_argument('--calibration', default=str(CALIBRATION_DIR), help="Sample images for static quantization")
+    parser.add_argument('--json', help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    classifier = DiseaseClassifier(engine="eager", precision="fp32")
+    engine = build_precision_engine(
+        args.mode, classifier.model, classifier.device, classifier.transform, args.calibration
+    )
+    report = accuracy_report(classifier.model, engine, classifier.transform, args.data)
+    module = getattr(engine, 'module', classifier.model)
+    report['model_bytes'] = {
+        'fp32': model_size_bytes(classifier.model),
+        args.mode: model_size_bytes(module),
+        # The fp32 model stays loaded for Grad-CAM next to a quantized copy
+        'resident': resident_bytes(classifier.model, engine),
+    }
+    report['mode'] = args.mode
+
+    print(f"{'Class':55} {'N':>5} {'Agree':>7} {'fp32':>7} {args.mode:>12}")
+    for class_name, row in report['per_class'].items():
+        flag = "  ⚠️" if row['top1_agreement'] < PRECISION_MIN_AGREEMENT else ""
+        print(f"{class_name:55} {row['images']:5d} {row['top1_agreement']:7.1%} "
+              f"{row['fp32_accuracy']:7.1%} {row['reduced_accuracy']:12.1%}{flag}")
+
+    overall = report['overall']
+    if overall['images']:
+        print(f"{'OVERALL':55} {overall['images']:5d} {overall['top1_agreement']:7.1%} "
+              f"{overall['fp32_accuracy']:7.1%} {overall['reduced_accuracy']:12.1%}")
+    print(f"📦 Model size: fp32 {report['model_bytes']['fp32'] / 1e6:.1f} MB, "
+          f"{args.mode} {report['model_bytes'][args.mode] / 1e6:.1f} MB, "
+          f"resident with {args.mode} {report['model_bytes']['resident'] / 1e6:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
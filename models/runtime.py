@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import torch
+
+from config import MODEL_INPUT_SIZE
+
+
+def host_fingerprint(classifier, workers=1):
+    """Identify the host/runtime combination a tuning profile is valid for"""
+    return {
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'torch': torch.__version__,
+        'device': str(classifier.device),
+        'engine': classifier.engine.name,
+        'precision': classifier.precision,
+        'workers': workers,
+    }
+
+
+def _fingerprint_key(fingerprint):
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def load_profile(path, fingerprint):
+    """Return the persisted tuning profile for this host, or None"""
+    try:
+        with open(path, 'r') as f:
+            profiles = json.load(f)
+        return profiles.get(_fingerprint_key(fingerprint))
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(path, fingerprint, profile):
+    """Persist a tuning profile next to those of other hosts sharing the file"""
+    path = Path(path)
+    try:
+        with open(path, 'r') as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        profiles = {}
+
+    profiles[_fingerprint_key(fingerprint)] = dict(profile, fingerprint=fingerprint)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def apply_profile(profile):
+    """Apply thread settings from a profile; inter-op threads can only be set before first use"""
+    torch.set_num_threads(profile['num_threads'])
+    interop = profile.get('num_interop_threads')
+    if interop and torch.get_num_interop_threads() != interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            # Inter-op pool already started in this process; takes effect on the next boot
+            pass
+
+
+def _synthetic_batch(batch_size):
+    return [torch.randn(1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE) for _ in range(batch_size)]
+
+
+def _time_batches(run, batch_size, iterations):
+    images = _synthetic_batch(batch_size)
+    run(images)  # untimed, absorbs allocator growth for this shape
+    started = time.perf_counter()
+    for _ in range(iterations):
+        run(images)
+    elapsed = (time.perf_counter() - started) / iterations
+    return {'batch_latency_ms': elapsed * 1000.0, 'images_per_sec': batch_size / elapsed}
+
+
+def threads_per_worker(workers=1):
+    """Cores available to each of ``workers`` processes sharing this host"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def thread_candidates(workers=1):
+    """Powers of two up to the cores available to this worker, plus that core count"""
+    available = threads_per_worker(workers)
+    candidates = {available}
+    n = 1
+    while n < available:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def autotune(classifier, batch_sizes=(1, 2, 4, 8, 16), workers=1, iterations=3, min_efficiency=0.9):
+    """Benchmark thread counts and batch sizes on this host
+
+    Picks the thread count with the best throughput, then the smallest batch size
+    reaching ``min_efficiency`` of the best throughput (larger batches only add latency).
+    """
+    original_threads = torch.get_num_threads()
+    results = []
+    try:
+        for num_threads in thread_candidates(workers):
+            torch.set_num_threads(num_threads)
+            for batch_size in batch_sizes:
+                timing = _time_batches(classifier.predict_batch, batch_size, iterations)
+                results.append(dict(timing, num_threads=num_threads, batch_size=batch_size))
+                print(f"⏱️  threads={num_threads:<3} batch={batch_size:<3} "
+                      f"{timing['images_per_sec']:7.1f} img/s  {timing['batch_latency_ms']:7.1f} ms/batch")
+    finally:
+        torch.set_num_threads(original_threads)
+
+    best = max(results, key=lambda r: r['images_per_sec'])
+    same_threads = [r for r in results if r['num_threads'] == best['num_threads']]
+    chosen = min(
+        (r for r in same_threads if r['images_per_sec'] >= best['images_per_sec'] * min_efficiency),
+        key=lambda r: r['batch_size']
+    )
+
+    return {
+        'num_threads': chosen['num_threads'],
+        # Request-level concurrency comes from the executors; keep torch's inter-op pool small
+        'num_interop_threads': 1 if chosen['num_threads'] > 1 else 2,
+        'batch_size': chosen['batch_size'],
+        'images_per_sec': chosen['images_per_sec'],
+        'batch_latency_ms': chosen['batch_latency_ms'],
+        'results': results,
+        'tuned_at': time.time(),
+    }
+
+
+def warm_up(classifier, gradcam=None, batch_sizes=(1,), iterations=2, top_k=1):
+    """Run synthetic batches through every inference path used by requests"""
+    started = time.perf_counter()
+    for batch_size in batch_sizes:
+        images = _synthetic_batch(batch_size)
+        for _ in range(iterations):
+            classifier.predict_batch(images)
+            if gradcam is not None:
+                classifier.explain_batch(images, gradcam, top_k=top_k)
+    return time.perf_counter() - started
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+GreenLens Bulk Scanner
+Scores a directory tree of field images offline, without the HTTP server.
+
+Images are decoded and preprocessed in a process pool, classified in batches by a
+single model instance, and results are appended to a CSV or JSONL file as they are
+produced. Re-running with --resume skips every image already scored in the output
+file; images whose decode failed are retried.
+
+Example:
+    python scan.py /data/field_photos --output scores.jsonl --workers 16 --batch-size 32 --resume
+"""
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+FIELDS = ['path', 'disease', 'class_index', 'confidence', 'error']
+
+_worker_transform = None
+
+def _init_worker():
+    """Build the preprocessing pipeline once per worker process"""
+    global _worker_transform
+    import torch
+    from models.disease_classifier import build_transform
+
+    # Each worker handles one image at a time; let the pool provide the parallelism
+    torch.set_num_threads(1)
+    _worker_transform = build_transform()
+
+def _load_image(path):
+    """Decode and preprocess one image in a worker; returns (path, array or None, error)"""
+    from PIL import Image
+    from config import MODEL_RESIZE_SIZE
+    from utils.image_utils import draft_for_short_side
+    try:
+        with Image.open(path) as img:
+            # Decode JPEGs at the smallest scale the model's resize still needs
+            tensor = _worker_transform(draft_for_short_side(img, MODEL_RESIZE_SIZE).convert('RGB'))
+        return path, tensor.numpy(), None
+    except Exception as e:
+        return path, None, str(e)
+
+def find_images(root):
+    """Yield image paths under root in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(dirpath, filename)
+
+def complete_records_size(output_path):
+    """Byte length of an output file up to its last newline, i.e. without a partially written record"""
+    with open(output_path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(64 * 1024, position)
+            position -= step
+            f.seek(position)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                return position + newline + 1
+    return 0
+
+def load_completed(output_path):
+    """Paths already scored in an existing output file (the resume checkpoint)
+
+    A record cut off by an interrupted run is ignored, as are rows that recorded an
+    error, so those images are retried.
+    """
+    completed = set()
+    if not output_path.exists():
+        return completed
+
+    with open(output_path, 'rb') as f:
+        content = f.read(complete_records_size(output_path)).decode('utf-8', errors='replace')
+
+    if output_path.suffix.lower() == '.csv':
+        for row in csv.DictReader(io.StringIO(content, newline='')):
+            # Missing trailing fields leave None; extra ones land under the None key
+            if None in row or any(row.get(field) is None for field in FIELDS):
+                continue
+            if row['path'] and not row['error']:
+                completed.add(row['path'])
+    else:
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+                if record['path'] and not record.get('error'):
+                    completed.add(record['path'])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return completed
+
+class ResultWriter:
+    """Append scan results to CSV or JSONL, flushing after every batch"""
+
+    def __init__(self, output_path, append):
+        self.is_csv = output_path.suffix.lower() == '.csv'
+        if append and output_path.exists():
+            # Drop a record cut off by an interrupted run so new records start on a fresh line
+            size = complete_records_size(output_path)
+            if size < output_path.stat().st_size:
+                os.truncate(output_path, size)
+        write_header = not (append and output_path.exists() and output_path.stat().st_size > 0)
+        self.file = open(output_path, 'a' if append else 'w', encoding='utf-8', newline='')
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if write_header:
+                self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.is_csv:
+                self.writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def scan(root, output_path, workers, batch_size, resume):
+    import torch
+    from models.disease_classifier import DiseaseClassifier
+
+    completed = load_completed(output_path) if resume else set()
+    pending = [path for path in find_images(root) if path not in completed]
+    print(f"🗂️ {len(pending)} images to scan ({len(completed)} already done)")
+    if not pending:
+        return
+
+    classifier = DiseaseClassifier()
+    writer = ResultWriter(output_path, append=resume)
+
+    started = time.time()
+    processed = 0
+    batch_paths, batch_arrays, rows = [], [], []
+
+    def flush():
+        nonlocal processed
+        if not batch_arrays and not rows:
+            return
+        if batch_arrays:
+            tensors = [torch.from_numpy(array).unsqueeze(0) for array in batch_arrays]
+            for path, prediction in zip(batch_paths, classifier.predict_batch(tensors)):
+                rows.append({
+                    'path': path,
+                    'disease': prediction['disease'],
+                    'class_index': prediction['class_index'],
+                    'confidence': round(prediction['confidence'], 6),
+                    'error': ''
+                })
+        writer.write(rows)
+        processed += len(rows)
+        batch_paths.clear()
+        batch_arrays.clear()
+        rows.clear()
+
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"📊 {processed}/{len(pending)} images ({processed / elapsed:.1f} img/s)", flush=True)
+
+    context = multiprocessing.get_context('spawn')
+    try:
+        with context.Pool(processes=workers, initializer=_init_worker) as pool:
+            for path, array, error in pool.imap(_load_image, pending, chunksize=max(1, batch_size // 4)):
+                if error is not None:
+                    rows.append({'path': path, 'disease': '', 'class_index': '', 'confidence': '', 'error': error})
+                else:
+                    batch_paths.append(path)
+                    batch_arrays.append(array)
+
+                if len(batch_arrays) >= batch_size:
+                    flush()
+
+            flush()
+    finally:
+        writer.close()
+
+    elapsed = time.time() - started
+    print(f"✅ Scanned {processed} images in {elapsed:.1f}s -> {output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory of crop images with GreenLens")
+    parser.add_argument('root', help="Directory tree of images to scan")
+    parser.add_argument('--output', '-o', default='greenlens_scan.jsonl', help="Output file (.csv or .jsonl)")
+    parser.add_argument('--workers', '-w', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Decode/preprocess worker processes")
+    parser.add_argument('--batch-size', '-b', type=int, default=32, help="Images per model forward pass")
+    parser.add_argument('--resume', action='store_true', help="Skip images already scored in the output file")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"❌ Not a directory: {args.root}")
+        sys.exit(1)
+
+    print("🌱 GreenLens Bulk Scanner")
+    print("=" * 50)
+    scan(args.root, Path(args.output), args.workers, max(1, args.batch_size), args.resume)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+AUDIO_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.mp3$')
+
+
+class AudioCache:
+    """Bounded, content-addressed store of synthesized speech files.
+
+    Files are named after a hash of the spoken text and language, so identical
+    texts map to the same file and can be served with long-lived cache headers.
+    """
+
+    def __init__(self, cache_dir, url_prefix, max_bytes=256 * 1024 * 1024, max_files=2000):
+        self.cache_dir = Path(cache_dir)
+        self.url_prefix = url_prefix.rstrip('/')
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # name -> size, least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Index existing files once at startup, oldest access first"""
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and AUDIO_NAME_PATTERN.match(path.name):
+                stat = path.stat()
+                entries.append((stat.st_atime, path.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def key_for(text, language):
+        digest = hashlib.sha256(f"{language}\0{text}".encode('utf-8')).hexdigest()
+        return f"{digest}.mp3"
+
+    def path_for(self, name):
+        return self.cache_dir / name
+
+    def url_for(self, name):
+        return f"{self.url_prefix}/{name}"
+
+    def lookup(self, name):
+        """Return True (and mark as recently used) if name is cached
+
+        Each server worker keeps its own index, so another worker's eviction may have
+        deleted a file this one still lists; such an entry is dropped as a miss.
+        """
+        with self._lock:
+            if name in self._index:
+                if self.path_for(name).is_file():
+                    self._index.move_to_end(name)
+                    self.hits += 1
+                    return True
+                self._total_bytes -= self._index.pop(name)
+            self.misses += 1
+            return False
+
+    def touch(self, name):
+        """Mark a cached file as recently used, e.g. when it is served"""
+        with self._lock:
+            if name in self._index:
+                self._index.move_to_end(name)
+
+    def store(self, name, data):
+        """Atomically write data under name and evict least recently used files over quota"""
+        path = self.path_for(name)
+        tmp_path = path.with_name(f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self._index and (self._total_bytes > self.max_bytes or len(self._index) > self.max_files):
+            name, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                self.path_for(name).unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'files': len(self._index),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
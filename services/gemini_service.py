@@ -2,14 +2,37 @@ import os
 import json
 from google import genai
 from google.genai import types
-from config import GEMINI_API_KEY
+from config import (
+    GEMINI_API_KEY, REMEDY_CACHE_DIR, REMEDY_CACHE_SIZE,
+    REMEDY_CACHE_TTL, REMEDY_DISK_CACHE_TTL
+)
+from services.remedy_cache import RemedyCache
+
+REMEDY_UNAVAILABLE = "Unable to generate remedy at this time."
+REMEDY_ERROR_PREFIX = "Error generating remedy:"
 
 class GeminiService:
-    def __init__(self):
+    def __init__(self, remedy_cache=None):
         self.client = genai.Client(api_key=GEMINI_API_KEY)
+        self.remedy_cache = remedy_cache or RemedyCache(
+            REMEDY_CACHE_DIR,
+            max_entries=REMEDY_CACHE_SIZE,
+            ttl_seconds=REMEDY_CACHE_TTL,
+            disk_ttl_seconds=REMEDY_DISK_CACHE_TTL
+        )
+        self.upstream_errors = 0
     
     def generate_disease_remedy(self, disease_name, weather_info=None):
-        """Generate remedy and care instructions for detected disease"""
+        """Generate remedy and care instructions for detected disease
+
+        Remedies are cached per disease and bucketed weather, so only the first
+        request for a given combination pays for the LLM round trip.
+        """
+        cache_key = self.remedy_cache.make_key(disease_name, weather_info)
+        cached_remedy = self.remedy_cache.get(cache_key)
+        if cached_remedy is not None:
+            return cached_remedy
+
         try:
             # Clean disease name for better prompt
             clean_disease = disease_name.replace('_', ' ').replace('(', '').replace(')', '')
@@ -61,12 +84,26 @@ class GeminiService:
                 contents=prompt
             )
             
-            return response.text or "Unable to generate remedy at this time."
+            if not response.text:
+                return REMEDY_UNAVAILABLE
+
+            self.remedy_cache.set(cache_key, response.text)
+            return response.text
             
         except Exception as e:
+            self.upstream_errors += 1
             print(f"Error generating remedy: {e}")
-            return f"Error generating remedy: {str(e)}"
+            return f"{REMEDY_ERROR_PREFIX} {str(e)}"
     
+    @staticmethod
+    def is_fallback_remedy(remedy_text):
+        """Whether generate_disease_remedy returned a placeholder instead of an LLM answer"""
+        return not remedy_text or remedy_text == REMEDY_UNAVAILABLE or remedy_text.startswith(REMEDY_ERROR_PREFIX)
+
+    def invalidate_remedies(self, disease_name=None):
+        """Drop cached remedies for one disease, or all of them when disease_name is None"""
+        return self.remedy_cache.invalidate(disease_name)
+
     def analyze_crop_image(self, image_path, disease_prediction):
         """Analyze crop image with disease context"""
         try:
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from utils.cache import TTLCache
+
+
+def _band(value, width):
+    """Lower bound of the width-sized band containing value"""
+    try:
+        return int(float(value) // width * width)
+    except (TypeError, ValueError):
+        return None
+
+
+def _condition_class(condition):
+    """Collapse WeatherAPI condition text into a handful of classes"""
+    text = (condition or '').lower()
+    if any(word in text for word in ('rain', 'drizzle', 'shower', 'thunder')):
+        return 'wet'
+    if any(word in text for word in ('snow', 'sleet', 'ice', 'blizzard')):
+        return 'snow'
+    if any(word in text for word in ('fog', 'mist', 'haze')):
+        return 'fog'
+    if any(word in text for word in ('cloud', 'overcast')):
+        return 'cloudy'
+    if any(word in text for word in ('sun', 'clear')):
+        return 'clear'
+    return 'other'
+
+
+class RemedyCache:
+    """Two-tier (memory LRU + on-disk JSON) cache of generated remedies.
+
+    Entries are keyed on the disease plus a bucketed weather signature, so nearby
+    weather readings share one treatment plan instead of each paying an LLM call.
+    """
+
+    def __init__(self, cache_dir, max_entries=256, ttl_seconds=6 * 3600,
+                 disk_ttl_seconds=7 * 24 * 3600, temp_band=5, humidity_band=20):
+        self.cache_dir = Path(cache_dir)
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk_ttl_seconds = disk_ttl_seconds
+        self.temp_band = temp_band
+        self.humidity_band = humidity_band
+        self._disk_lock = threading.Lock()
+
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.writes = 0
+
+    def make_key(self, disease_name, weather_info=None):
+        """Build the cache key for a disease and (optional) weather reading"""
+        if weather_info:
+            signature = "t{}|h{}|{}".format(
+                _band(weather_info.get('temperature'), self.temp_band),
+                _band(weather_info.get('humidity'), self.humidity_band),
+                _condition_class(weather_info.get('condition')),
+            )
+        else:
+            signature = "no-weather"
+        return f"{disease_name}::{signature}"
+
+    def _disease_prefix(self, disease_name):
+        return re.sub(r'[^A-Za-z0-9]+', '_', disease_name).strip('_').lower()[:60]
+
+    def _disk_path(self, key):
+        disease_name = key.split('::', 1)[0]
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return self.cache_dir / f"{self._disease_prefix(disease_name)}__{digest}.json"
+
+    def get(self, key):
+        """Return the cached remedy text for key, or None; hits are counted per tier (see tier_hits)"""
+        remedy = self.memory.get(key)
+        if remedy is not None:
+            return remedy
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get('key') != key:
+                raise FileNotFoundError(path)
+            if time.time() - entry.get('created_at', 0) > self.disk_ttl_seconds:
+                # Expired entries are removed as they are found rather than left to pile up
+                with self._disk_lock:
+                    path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+        except (OSError, ValueError):
+            self.disk_misses += 1
+            return None
+
+        # Promote disk hits into the memory tier
+        self.disk_hits += 1
+        self.memory.set(key, entry['remedy'])
+        return entry['remedy']
+
+    def set(self, key, remedy):
+        """Store remedy text in both tiers"""
+        self.memory.set(key, remedy)
+
+        path = self._disk_path(key)
+        entry = {'key': key, 'remedy': remedy, 'created_at': time.time()}
+        try:
+            with self._disk_lock:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, path)
+            self.writes += 1
+        except OSError as e:
+            print(f"Error writing remedy cache entry: {e}")
+
+    def invalidate(self, disease_name=None):
+        """Drop cached remedies for one disease (or all of them); returns entries removed
+
+        An entry held in both tiers counts once.
+        """
+        removed = set()  # disk file names of the entries dropped
+
+        def matches(key):
+            if disease_name is not None and key.split('::', 1)[0] != disease_name:
+                return False
+            removed.add(self._disk_path(key).name)
+            return True
+
+        self.memory.invalidate(matches)
+        pattern = "*.json" if disease_name is None else f"{self._disease_prefix(disease_name)}__*.json"
+
+        with self._disk_lock:
+            for path in self.cache_dir.glob(pattern):
+                try:
+                    path.unlink()
+                    removed.add(path.name)
+                except OSError:
+                    pass
+        return len(removed)
+
+    def tier_hits(self):
+        """Hits by the tier that served them"""
+        return {'memory': self.memory.hits, 'disk': self.disk_hits}
+
+    def stats(self):
+        """Memory-tier stats, with hits and misses counted across both tiers"""
+        stats = self.memory.stats()
+        hits = self.memory.hits + self.disk_hits
+        lookups = hits + self.disk_misses
+        stats.update({
+            'hits': hits,
+            'misses': self.disk_misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'memory_hits': self.memory.hits,
+            'disk_hits': self.disk_hits,
+            'disk_misses': self.disk_misses,
+            'writes': self.writes,
+        })
+        return stats
@@ -5,6 +5,8 @@ import base64
 import io
 import os
 from googletrans import Translator # Import the Translator
+from config import TEMP_AUDIO_DIR, AUDIO_CACHE_DIR, AUDIO_CACHE_URL, AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_MAX_FILES
+from services.audio_cache import AudioCache
 
 class TTSService:
     def __init__(self):
@@ -16,10 +18,19 @@ class TTSService:
             "gujarati": "gu"
             # Add more languages if needed. Ensure these keys match what you'll get from frontend.
         }
-        self.temp_dir = "temp_audio" # Ensure this directory exists or is created
-        os.makedirs(self.temp_dir, exist_ok=True) 
+        self.temp_dir = str(TEMP_AUDIO_DIR)  # expired files are removed by the artifact janitor
+        os.makedirs(self.temp_dir, exist_ok=True)
 
         self.translator = Translator() # Initialize the translator
+        self.upstream_errors = 0  # failed gTTS synthesis or translation calls
+
+        # Synthesized speech is stored content-addressed and served as static files
+        self.audio_cache = AudioCache(
+            AUDIO_CACHE_DIR,
+            AUDIO_CACHE_URL,
+            max_bytes=AUDIO_CACHE_MAX_BYTES,
+            max_files=AUDIO_CACHE_MAX_FILES
+        )
 
     def text_to_speech(self, text, language='en'):
         """Convert text to speech and return base64 encoded audio"""
@@ -42,6 +53,35 @@ class TTSService:
             print(f"Error converting text to speech for language '{language}': {e}")
             return None
 
+    @staticmethod
+    def voice_key(tts_language_code, slow=False):
+        """Cache key part for the voice settings audio is synthesized with"""
+        return f"{tts_language_code}|slow={slow}"
+
+    def text_to_speech_url(self, text, language='en'):
+        """Convert text to speech and return the URL of the cached MP3 file"""
+        tts_language_code = self.language_map.get(language.lower(), 'en')
+        name = self.audio_cache.key_for(text, self.voice_key(tts_language_code))
+
+        # Repeat texts (common with cached remedies) skip synthesis entirely
+        if self.audio_cache.lookup(name):
+            return self.audio_cache.url_for(name)
+        return self.synthesize_to_cache(name, text, tts_language_code)
+
+    def synthesize_to_cache(self, name, text, tts_language_code):
+        """Synthesize text, store it in the audio cache under name and return its URL"""
+        try:
+            tts = gTTS(text=text, lang=tts_language_code, slow=False)
+            audio_buffer = io.BytesIO()
+            tts.write_to_fp(audio_buffer)
+            self.audio_cache.store(name, audio_buffer.getvalue())
+            return self.audio_cache.url_for(name)
+
+        except Exception as e:
+            self.upstream_errors += 1
+            print(f"Error converting text to speech for language '{tts_language_code}': {e}")
+            return None
+
     def create_quick_summary_audio(self, disease, confidence, risk_level, language_code="en"):
         # The base English text for the summary
         english_text = f"Detected {disease} with {confidence*100:.1f}% confidence. The risk level is {risk_level}."
@@ -72,6 +112,14 @@ class TTSService:
             f"Recommended remedy: {remedy_text}."
         )
 
+        # Keyed on the English source text, so a repeat request skips the translation round trip too
+        tts_language_code = self.language_map.get(language_code.lower(), 'en')
+        name = self.audio_cache.key_for(
+            english_comprehensive_text, f"{self.voice_key(tts_language_code)}|from=en"
+        )
+        if self.audio_cache.lookup(name):
+            return self.audio_cache.url_for(name)
+
         final_text = english_comprehensive_text
         # Translate if the target language is not English
         if language_code.lower() != 'english' and language_code.lower() in self.language_map:
@@ -83,6 +131,11 @@ class TTSService:
                 else:
                     print(f"Warning: Translation failed for comprehensive text to '{dest_lang}'. Using English text.")
             except Exception as e:
+                self.upstream_errors += 1
                 print(f"Error during translation of comprehensive text: {e}. Using English text.")
-        
-        return self.text_to_speech(final_text, language=language_code)
\ No newline at end of file
+
+            if final_text is english_comprehensive_text:
+                # Don't store the English fallback where the translated audio belongs
+                return self.text_to_speech_url(final_text, language=language_code)
+
+        return self.synthesize_to_cache(name, final_text, tts_language_code)
@@ -1,78 +1,176 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from config import WEATHER_API_KEY, WEATHER_DISEASE_RULES
+from requests.adapters import HTTPAdapter
+from config import (
+    WEATHER_API_KEY, WEATHER_DISEASE_RULES, WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT,
+    WEATHER_POOL_SIZE, WEATHER_CACHE_SIZE, WEATHER_UPDATE_INTERVAL, WEATHER_MIN_TTL,
+    WEATHER_STALE_TTL, FORECAST_CACHE_TTL
+)
+from utils.cache import TTLCache
+
+_COORDINATES = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+def normalize_location(location):
+    """Canonical cache key for a user supplied location string"""
+    match = _COORDINATES.match(location or '')
+    if match:
+        # ~1 km precision is plenty for weather lookups
+        return f"{float(match.group(1)):.2f},{float(match.group(2)):.2f}"
+    return ' '.join((location or '').split()).lower()
 
 class WeatherService:
     def __init__(self):
         self.api_key = WEATHER_API_KEY
         self.base_url = "http://api.weatherapi.com/v1"
-    
+        self.timeout = (WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT)
+
+        # Shared keep-alive connection pool for every upstream call
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=WEATHER_POOL_SIZE, pool_maxsize=WEATHER_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Entries live for their fresh window plus WEATHER_STALE_TTL; stale ones are
+        # served immediately while a background refresh runs
+        self.cache = TTLCache(max_entries=WEATHER_CACHE_SIZE, ttl_seconds=None)
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self.stale_served = 0
+        self.upstream_errors = 0
+
+    def _request(self, endpoint, params):
+        """GET an API endpoint through the pooled session with strict timeouts"""
+        params = dict(params, key=self.api_key)
+        response = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _cached(self, cache_key, fetch):
+        """Serve cache_key from the cache, refreshing stale entries in the background
+
+        ``fetch`` returns ``(value, fresh_until)``; it is called synchronously on a miss.
+        """
+        entry = self.cache.get(cache_key)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() >= fresh_until:
+                self.stale_served += 1
+                self._refresh_in_background(cache_key, fetch)
+            return value
+
+        value, fresh_until = fetch()
+        self._store(cache_key, value, fresh_until)
+        return value
+
+    def _store(self, cache_key, value, fresh_until):
+        ttl = max(0.0, fresh_until - time.time()) + WEATHER_STALE_TTL
+        self.cache.set(cache_key, (value, fresh_until), ttl_seconds=ttl)
+
+    def _refresh_in_background(self, cache_key, fetch):
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                value, fresh_until = fetch()
+                self._store(cache_key, value, fresh_until)
+            except Exception as e:
+                # Keep serving the stale value until it hard-expires
+                self.upstream_errors += 1
+                print(f"Error refreshing weather cache for {cache_key}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+
+        self._refresh_executor.submit(refresh)
+
+    def _fetch_current(self, location):
+        data = self._request("current.json", {'q': location, 'aqi': 'no'})
+
+        weather = {
+            'location': data['location']['name'],
+            'country': data['location']['country'],
+            'temperature': data['current']['temp_c'],
+            'humidity': data['current']['humidity'],
+            'condition': data['current']['condition']['text'],
+            'wind_speed': data['current']['wind_kph'],
+            'pressure': data['current']['pressure_mb'],
+            'visibility': data['current']['vis_km'],
+            'uv_index': data['current']['uv'],
+            'last_updated': data['current']['last_updated']
+        }
+
+        # The provider refreshes current conditions on a fixed interval, so the
+        # reading stays valid until last_updated + interval
+        now = time.time()
+        last_updated = data['current'].get('last_updated_epoch') or now
+        fresh_until = last_updated + WEATHER_UPDATE_INTERVAL
+        fresh_until = min(max(fresh_until, now + WEATHER_MIN_TTL), now + WEATHER_UPDATE_INTERVAL)
+        return weather, fresh_until
+
     def get_weather_data(self, location):
         """Get current weather data for location"""
         try:
-            url = f"{self.base_url}/current.json"
-            params = {
-                'key': self.api_key,
-                'q': location,
-                'aqi': 'no'
-            }
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            return {
-                'location': data['location']['name'],
-                'country': data['location']['country'],
-                'temperature': data['current']['temp_c'],
-                'humidity': data['current']['humidity'],
-                'condition': data['current']['condition']['text'],
-                'wind_speed': data['current']['wind_kph'],
-                'pressure': data['current']['pressure_mb'],
-                'visibility': data['current']['vis_km'],
-                'uv_index': data['current']['uv'],
-                'last_updated': data['current']['last_updated']
-            }
+            return self._cached(
+                ('current', normalize_location(location)),
+                lambda: self._fetch_current(location)
+            )
             
         except Exception as e:
+            self.upstream_errors += 1
             print(f"Error fetching weather data: {e}")
             return None
+
+    def _fetch_forecast(self, location, days):
+        data = self._request("forecast.json", {
+            'q': location,
+            'days': days,
+            'aqi': 'no',
+            'alerts': 'no'
+        })
+
+        forecast = []
+        for day in data['forecast']['forecastday']:
+            forecast.append({
+                'date': day['date'],
+                'max_temp': day['day']['maxtemp_c'],
+                'min_temp': day['day']['mintemp_c'],
+                'avg_temp': day['day']['avgtemp_c'],
+                'humidity': day['day']['avghumidity'],
+                'condition': day['day']['condition']['text'],
+                'rain_chance': day['day']['daily_chance_of_rain'],
+                'rain_mm': day['day']['totalprecip_mm']
+            })
+
+        return forecast, time.time() + FORECAST_CACHE_TTL
     
     def get_forecast(self, location, days=3):
         """Get weather forecast for location"""
         try:
-            url = f"{self.base_url}/forecast.json"
-            params = {
-                'key': self.api_key,
-                'q': location,
-                'days': days,
-                'aqi': 'no',
-                'alerts': 'no'
-            }
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            forecast = []
-            for day in data['forecast']['forecastday']:
-                forecast.append({
-                    'date': day['date'],
-                    'max_temp': day['day']['maxtemp_c'],
-                    'min_temp': day['day']['mintemp_c'],
-                    'avg_temp': day['day']['avgtemp_c'],
-                    'humidity': day['day']['avghumidity'],
-                    'condition': day['day']['condition']['text'],
-                    'rain_chance': day['day']['daily_chance_of_rain'],
-                    'rain_mm': day['day']['totalprecip_mm']
-                })
-            
-            return forecast
+            return self._cached(
+                ('forecast', normalize_location(location), days),
+                lambda: self._fetch_forecast(location, days)
+            )
             
         except Exception as e:
+            self.upstream_errors += 1
             print(f"Error fetching forecast: {e}")
             return None
+
+    def cache_stats(self):
+        stats = self.cache.stats()
+        stats.update({
+            'stale_served': self.stale_served,
+            'refreshing': len(self._refreshing),
+            'upstream_errors': self.upstream_errors
+        })
+        return stats
     
     def assess_disease_risk(self, disease_name, weather_data):
         """Assess disease risk based on weather conditions"""
@@ -125,6 +125,13 @@ class GreenLensApp {
             const formData = new FormData();
             formData.append('file', this.selectedFile);
             formData.append('location', document.getElementById('locationInput').value || 'New York');
+            // Also explain the runner-up classes so similar diseases can be told apart
+            formData.append('explain_top_k', '3');
+
+            if (this.supportsStreaming()) {
+                await this.analyzeImageStreaming(formData);
+                return;
+            }
 
             const response = await axios.post('/api/detect-disease', formData, {
                 headers: {
@@ -148,7 +155,93 @@ class GreenLensApp {
         }
     }
 
-    displayResults(data) {
+    supportsStreaming() {
+        return typeof window.fetch === 'function' &&
+            typeof window.ReadableStream === 'function' &&
+            typeof window.TextDecoder === 'function';
+    }
+
+    async analyzeImageStreaming(formData) {
+        // Ask the server to emit each stage as an NDJSON event as soon as it is ready
+        formData.append('stream', 'true');
+
+        const controller = new AbortController();
+        const timeout = setTimeout(() => controller.abort(), 120000); // 120 seconds timeout
+
+        try {
+            const response = await fetch('/api/detect-disease', {
+                method: 'POST',
+                body: formData,
+                signal: controller.signal
+            });
+
+            if (!response.ok) {
+                let detail = `Analysis failed (${response.status})`;
+                try {
+                    detail = (await response.json()).detail || detail;
+                } catch (e) {
+                    // Non-JSON error body
+                }
+                throw new Error(detail);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let started = false;
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const message = JSON.parse(line);
+
+                    if (message.event === 'error') {
+                        throw new Error(message.data.detail || 'Analysis failed');
+                    }
+                    if (!started) {
+                        this.showResultsSection();
+                        started = true;
+                    }
+                    this.handleStreamEvent(message.event, message.data);
+                }
+            }
+        } finally {
+            clearTimeout(timeout);
+        }
+    }
+
+    handleStreamEvent(event, data) {
+        switch (event) {
+            case 'prediction':
+                this.displayPrediction(data);
+                // First useful result is in - release the button while the rest streams in
+                this.hideLoading();
+                break;
+            case 'gradcam':
+                this.displayGradcam(data);
+                break;
+            case 'weather':
+                this.displayWeather(data);
+                break;
+            case 'remedy':
+                this.displayRemedy(data);
+                break;
+            case 'audio':
+                this.displayAudio(data);
+                break;
+            default:
+                break;
+        }
+    }
+
+    showResultsSection() {
         // Hide error section
         document.getElementById('errorSection').classList.add('hidden');
 
@@ -156,15 +249,68 @@ class GreenLensApp {
         document.getElementById('resultsSection').classList.remove('hidden');
         document.getElementById('resultsSection').classList.add('fade-in');
 
+        // Scroll to results
+        document.getElementById('resultsSection').scrollIntoView({ 
+            behavior: 'smooth', 
+            block: 'start' 
+        });
+    }
+
+    displayResults(data) {
+        this.showResultsSection();
+        this.displayPrediction(data);
+        this.displayGradcam(data);
+        this.displayWeather(data);
+        this.displayRemedy(data);
+        this.displayAudio(data);
+    }
+
+    displayPrediction(data) {
         // Display disease detection results
         document.getElementById('detectedDisease').textContent = 
             data.disease.replace(/_/g, ' ').replace(/\(/g, '').replace(/\)/g, '');
+        this.lastConfidence = data.confidence;
+
+        // Display image analysis
+        if (data.image_analysis) {
+            document.getElementById('imageAnalysisContent').textContent = data.image_analysis;
+        }
+    }
 
+    displayGradcam(data) {
         // Display Grad-CAM visualization
         if (data.gradcam_image) {
             document.getElementById('gradcamImage').src = data.gradcam_image;
         }
 
+        // Runner-up classes, each with the regions that would support it
+        const container = document.getElementById('gradcamAlternatives');
+        container.innerHTML = '';
+        const alternatives = (data.gradcam_topk || []).slice(1).filter(item => item.gradcam_image);
+        container.classList.toggle('hidden', alternatives.length === 0);
+
+        alternatives.forEach(item => {
+            const figure = document.createElement('figure');
+            figure.className = 'border rounded-lg overflow-hidden';
+
+            const img = document.createElement('img');
+            // Heatmaps are computed on first view, so only fetch the ones actually scrolled to
+            img.loading = 'lazy';
+            img.src = item.gradcam_image;
+            img.alt = item.disease;
+            img.className = 'w-full h-28 object-cover';
+
+            const caption = document.createElement('figcaption');
+            caption.className = 'text-xs text-gray-600 p-1';
+            caption.textContent = `${item.disease} (${(item.confidence * 100).toFixed(1)}%)`;
+
+            figure.appendChild(img);
+            figure.appendChild(caption);
+            container.appendChild(figure);
+        });
+    }
+
+    displayWeather(data) {
         // Display weather information
         if (data.weather) {
             document.getElementById('weatherLocation').textContent = 
@@ -193,34 +339,26 @@ class GreenLensApp {
             riskLevel.textContent = data.risk_assessment.risk_level.toUpperCase();
             riskAssessment.textContent = data.risk_assessment.assessment;
         }
+    }
 
+    displayRemedy(data) {
         // Display AI-generated remedy with interactive formatting
         if (data.remedy) {
-            this.displayTreatmentPlan(data.remedy, data.confidence);
-        }
-
-        // Display image analysis
-        if (data.image_analysis) {
-            document.getElementById('imageAnalysisContent').textContent = data.image_analysis;
+            this.displayTreatmentPlan(data.remedy, data.confidence ?? this.lastConfidence);
         }
+    }
 
+    displayAudio(data) {
         // Setup audio
-        if (data.audio) {
-            this.setupAudio(data.audio);
+        if (data.audio_url) {
+            this.setupAudio(data.audio_url);
         }
-
-        // Scroll to results
-        document.getElementById('resultsSection').scrollIntoView({ 
-            behavior: 'smooth', 
-            block: 'start' 
-        });
     }
 
-    setupAudio(audioBase64) {
+    setupAudio(audioUrl) {
+        // Audio is a cacheable file URL; the browser streams it with range requests
         const audioPlayer = document.getElementById('audioPlayer');
-        const audioBlob = this.base64ToBlob(audioBase64, 'audio/mpeg');
-        const audioUrl = URL.createObjectURL(audioBlob);
-        
+        audioPlayer.preload = 'metadata';
         audioPlayer.src = audioUrl;
         audioPlayer.classList.remove('hidden');
         
@@ -253,16 +391,6 @@ class GreenLensApp {
         }
     }
 
-    base64ToBlob(base64, mimeType) {
-        const byteCharacters = atob(base64);
-        const byteNumbers = new Array(byteCharacters.length);
-        for (let i = 0; i < byteCharacters.length; i++) {
-            byteNumbers[i] = byteCharacters.charCodeAt(i);
-        }
-        const byteArray = new Uint8Array(byteNumbers);
-        return new Blob([byteArray], { type: mimeType });
-    }
-
     showLoading() {
         const analyzeBtn = document.getElementById('analyzeBtn');
         const analyzeText = document.getElementById('analyzeText');
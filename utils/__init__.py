@@ -1,5 +1,13 @@
 
 
-from .image_utils import save_uploaded_image, validate_image, cleanup_temp_files
+from .image_utils import (
+    save_uploaded_image, validate_image, cleanup_temp_files,
+    UploadedImage, ImageTooLarge, decode_uploaded_image, decode_downscaled, draft_for_short_side,
+    render_heatmap_overlay, encode_image, HEATMAP_COLORMAPS
+)
 
-__all__ = ["save_uploaded_image", "validate_image", "cleanup_temp_files"]
+__all__ = [
+    "save_uploaded_image", "validate_image", "cleanup_temp_files",
+    "UploadedImage", "ImageTooLarge", "decode_uploaded_image", "decode_downscaled", "draft_for_short_side",
+    "render_heatmap_overlay", "encode_image", "HEATMAP_COLORMAPS"
+]
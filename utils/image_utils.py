@@ -1,17 +1,84 @@
+import io
+import math
 import os
 import uuid
 from PIL import Image
-import cv2
 import numpy as np
 
-def save_uploaded_image(file_data, upload_dir):
+class ImageTooLarge(ValueError):
+    """The image's pixel count exceeds the configured limit"""
+
+
+class UploadedImage:
+    """An uploaded image decoded exactly once and shared by every pipeline stage
+
+    The raw bytes are kept so the upload can still be written to disk, but only
+    when a caller actually needs a file (see ``save``). ``image`` may be decoded at
+    reduced resolution; ``original_size`` is the size of the encoded image.
+    """
+
+    def __init__(self, data, image, image_id=None, original_size=None):
+        self.data = data
+        self.image = image
+        self.original_size = original_size or image.size
+        self.id = image_id or uuid.uuid4().hex
+        self.path = None
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def save(self, upload_dir):
+        """Persist the original bytes once and return the file path"""
+        if self.path is None:
+            self.path = save_uploaded_image(self.data, upload_dir, filename=f"{self.id}.jpg")
+        return self.path
+
+def draft_for_short_side(img, min_short_side):
+    """Put an opened (not yet loaded) image in draft mode for the smallest decode scale
+    whose short side is still at least ``min_short_side``
+
+    For JPEGs libjpeg then decodes at 1/2, 1/4 or 1/8 scale in the DCT domain, which
+    is several times faster and smaller than a full decode; other formats ignore it.
+    """
+    width, height = img.size
+    if min_short_side and min(width, height) > min_short_side:
+        scale = min_short_side / min(width, height)
+        img.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+    return img
+
+def decode_uploaded_image(file_data, image_id=None, min_short_side=None, max_pixels=None):
+    """Decode uploaded bytes into an RGB image, validating them in the same pass
+
+    With ``min_short_side`` the image is decoded at reduced resolution (see
+    ``draft_for_short_side``); the full-resolution bytes stay available as ``data``.
+    Raises ImageTooLarge above ``max_pixels`` (checked from the header, before
+    decoding) and ValueError if the bytes are not a decodable image.
+    """
+    try:
+        with Image.open(io.BytesIO(file_data)) as img:
+            original_size = img.size
+            if max_pixels and original_size[0] * original_size[1] > max_pixels:
+                raise ImageTooLarge(
+                    f"Image is {original_size[0]}x{original_size[1]}, limit is {max_pixels / 1e6:g} megapixels"
+                )
+            draft_for_short_side(img, min_short_side)
+            img.load()
+            image = img.convert('RGB') if img.mode != 'RGB' else img.copy()
+        return UploadedImage(file_data, image, image_id, original_size=original_size)
+    except ImageTooLarge:
+        raise
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {e}")
+
+def save_uploaded_image(file_data, upload_dir, filename=None):
     """Save uploaded image file"""
     try:
         # Create upload directory if it doesn't exist
         os.makedirs(upload_dir, exist_ok=True)
         
         # Generate unique filename
-        filename = f"{uuid.uuid4()}.jpg"
+        filename = filename or f"{uuid.uuid4()}.jpg"
         filepath = os.path.join(upload_dir, filename)
         
         # Save file
@@ -53,28 +120,91 @@ def save_image(image, filepath):
         print(f"Error saving image: {e}")
         raise
 
-def create_heatmap_overlay(original_image_path, heatmap_array, output_path, alpha=0.4):
+# Heatmap colormaps: 'red' is the original red-channel heat, the rest are OpenCV colormaps
+HEATMAP_COLORMAPS = ('red', 'jet', 'hot', 'inferno', 'viridis', 'turbo')
+_colormap_palettes = {}
+
+def colormap_palette(colormap):
+    """256-entry RGB palette (flat list) for a heatmap colormap"""
+    palette = _colormap_palettes.get(colormap)
+    if palette is None:
+        if colormap == 'red':
+            palette = [channel for i in range(256) for channel in (i, 0, 0)]
+        else:
+            import cv2
+            ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+            bgr = cv2.applyColorMap(ramp, getattr(cv2, f"COLORMAP_{colormap.upper()}"))
+            palette = bgr[:, 0, ::-1].flatten().tolist()
+        _colormap_palettes[colormap] = palette
+    return palette
+
+def decode_downscaled(file_data, max_side):
+    """Decode image bytes at reduced resolution; returns (RGB image, original size)
+
+    For JPEGs, draft mode makes libjpeg decode at 1/2, 1/4 or 1/8 scale directly, so
+    a 50 MP photo never exists in memory at full size. The result is at least
+    ``max_side`` on its long side (or the original size, if smaller).
+    """
+    with Image.open(io.BytesIO(file_data)) as img:
+        original_size = img.size
+        if max_side:
+            scale = max_side / max(original_size)
+            if scale < 1:
+                img.draft('RGB', (int(original_size[0] * scale), int(original_size[1] * scale)))
+        image = img.convert('RGB') if img.mode != 'RGB' else img.copy()
+    return image, original_size
+
+def render_heatmap_overlay(image, heatmap_array, region=None, colormap='jet', alpha=0.4, max_side=None):
+    """Blend a [0, 1] heatmap onto an image and return the overlay as a PIL image
+
+    The photo is first reduced to ``max_side`` on its long side, and colorizing and
+    blending run on 8-bit PIL images, so memory stays proportional to the output
+    size rather than to the camera's resolution. ``region`` is the
+    ``(left, top, right, bottom)`` box of ``image`` the heatmap covers; by default
+    it is stretched over the whole image.
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    elif not isinstance(image, Image.Image):
+        image = Image.open(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    scale = 1.0
+    if max_side and max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+    heatmap_array = np.asarray(heatmap_array).squeeze()
+    heat = Image.fromarray(np.clip(heatmap_array * 255, 0, 255).astype(np.uint8))
+    if region is None:
+        heat = heat.resize(image.size, Image.BILINEAR)
+    else:
+        left, top, right, bottom = (int(round(v * scale)) for v in region)
+        canvas = Image.new('L', image.size, 0)
+        canvas.paste(heat.resize((max(1, right - left), max(1, bottom - top)), Image.BILINEAR), (left, top))
+        heat = canvas
+
+    heat.putpalette(colormap_palette(colormap))
+    return Image.blend(image, heat.convert('RGB'), alpha)
+
+def encode_image(image, image_format='jpeg', quality=80):
+    """Encode a PIL image as optimized JPEG or WebP bytes"""
+    buffer = io.BytesIO()
+    if image_format == 'webp':
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+def create_heatmap_overlay(original_image_path, heatmap_array, output_path, alpha=0.4, colormap='jet', max_side=None):
     """Create heatmap overlay on original image"""
     try:
-        # Load original image
-        original = cv2.imread(original_image_path)
-        original = cv2.cvtColor(original, cv2.COLOR_BGR2RGB)
-        
-        # Resize heatmap to match original image
-        heatmap_resized = cv2.resize(heatmap_array, (original.shape[1], original.shape[0]))
-        
-        # Convert to heatmap
-        heatmap = cv2.applyColorMap(np.uint8(255 * heatmap_resized), cv2.COLORMAP_JET)
-        heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
-        
-        # Create overlay
-        overlay = original * (1 - alpha) + heatmap * alpha
-        overlay = np.uint8(overlay)
-        
-        # Save overlay
-        overlay_image = Image.fromarray(overlay)
-        overlay_image.save(output_path)
-        
+        overlay = render_heatmap_overlay(
+            original_image_path, heatmap_array, colormap=colormap, alpha=alpha, max_side=max_side
+        )
+        overlay.save(output_path)
         return output_path
         
     except Exception as e:
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class _Area:
+    __slots__ = ("directory", "max_age", "max_bytes", "max_files", "index", "bytes", "evictions")
+
+    def __init__(self, directory, max_age, max_bytes, max_files):
+        self.directory = Path(directory)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.index = OrderedDict()  # filename -> (size, last_used), least recently used first
+        self.bytes = 0
+        self.evictions = 0
+
+
+class ArtifactJanitor:
+    """Evict generated files by age and per-directory size quotas, off the request path.
+
+    Request handlers only ``track`` the files they write and ``touch`` the ones they
+    serve (in-memory O(1) updates); a background task sweeps the index every ``interval_seconds`` and deletes files
+    that expired or, least recently used first, exceed their directory's quota.
+    Each directory is scanned once at startup to pick up files from earlier runs.
+    """
+
+    def __init__(self, interval_seconds=60):
+        self.interval = interval_seconds
+        self._areas = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self.sweeps = 0
+
+    def register(self, name, directory, max_age_seconds=None, max_bytes=None, max_files=None):
+        """Manage files in directory under the given quotas (None means unlimited)"""
+        self._areas[name] = _Area(directory, max_age_seconds, max_bytes, max_files)
+
+    def track(self, name, path, size=None, last_used=None):
+        """Record a file just written (or used) in area ``name``"""
+        area = self._areas.get(name)
+        if area is None or path is None:
+            return
+        filename = Path(path).name
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+        with self._lock:
+            previous = area.index.pop(filename, None)
+            area.bytes += size - (previous[0] if previous else 0)
+            area.index[filename] = (size, last_used or time.time())
+
+    def touch(self, name, path):
+        """Mark a tracked file in area ``name`` as just used (e.g. served), keeping its size"""
+        area = self._areas.get(name)
+        if area is None:
+            return
+        filename = Path(path).name
+        with self._lock:
+            entry = area.index.pop(filename, None)
+            if entry is not None:
+                area.index[filename] = (entry[0], time.time())
+
+    def index_existing(self):
+        """Index files already on disk, oldest modification first"""
+        for name, area in self._areas.items():
+            try:
+                with os.scandir(area.directory) as entries:
+                    files = [
+                        (entry.stat().st_mtime, entry.name, entry.stat().st_size)
+                        for entry in entries if entry.is_file()
+                    ]
+            except OSError:
+                continue
+            for mtime, filename, size in sorted(files):
+                self.track(name, area.directory / filename, size=size, last_used=mtime)
+
+    def sweep(self, now=None):
+        """Delete expired and over-quota files; returns the number removed"""
+        now = now or time.time()
+        victims = []
+        with self._lock:
+            for area in self._areas.values():
+                while area.index:
+                    filename, (size, last_used) = next(iter(area.index.items()))
+                    expired = area.max_age is not None and now - last_used > area.max_age
+                    over_bytes = area.max_bytes is not None and area.bytes > area.max_bytes
+                    over_files = area.max_files is not None and len(area.index) > area.max_files
+                    if not (expired or over_bytes or over_files):
+                        break
+                    area.index.popitem(last=False)
+                    area.bytes -= size
+                    area.evictions += 1
+                    victims.append(area.directory / filename)
+            self.sweeps += 1
+
+        for path in victims:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️  Could not remove {path}: {e}")
+        return len(victims)
+
+    async def start(self):
+        """Index existing files and start the periodic sweep on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.index_existing)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                removed = await loop.run_in_executor(None, self.sweep)
+                if removed:
+                    print(f"🧹 Removed {removed} expired or over-quota artifacts")
+            except Exception as e:
+                print(f"⚠️  Artifact sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'directory': str(area.directory),
+                    'files': len(area.index),
+                    'bytes': area.bytes,
+                    'max_bytes': area.max_bytes,
+                    'max_age_seconds': area.max_age,
+                    'evictions': area.evictions,
+                }
+                for name, area in self._areas.items()
+            }
@@ -0,0 +1,101 @@
+# smaps_rollup fields (kB) reported per process
+_SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def _read_kb_fields(path, fields):
+    values = {}
+    with open(path, 'r') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in fields:
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def process_memory(pid="self"):
+    """Resident memory of a process in MB from /proc, or None where /proc is unavailable
+
+    PSS splits every shared page between the processes mapping it, so the PSS of
+    all workers adds up to the real footprint of the group while RSS counts shared
+    model weights once per worker.
+    """
+    try:
+        kb = _read_kb_fields(f"/proc/{pid}/smaps_rollup", _SMAPS_FIELDS)
+    except OSError:
+        try:
+            # Kernels older than 4.14 have no smaps_rollup; RSS alone is still useful
+            status = _read_kb_fields(f"/proc/{pid}/status", ('VmRSS',))
+        except OSError:
+            return None
+        return {'rss_mb': round(status.get('VmRSS', 0) / 1024, 1), 'pss_mb': None}
+
+    return {
+        'rss_mb': round(kb.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(kb.get('Pss', 0) / 1024, 1),
+        'shared_mb': round((kb.get('Shared_Clean', 0) + kb.get('Shared_Dirty', 0)) / 1024, 1),
+        'private_mb': round((kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)) / 1024, 1),
+    }
+
+
+def reset_peak_rss(pid="self"):
+    """Reset the kernel's peak RSS mark (VmHWM) so the next reading covers only what follows (Linux 4.0+)"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb(pid="self"):
+    """Peak resident memory in MB since process start or the last reset_peak_rss, or None"""
+    try:
+        return round(_read_kb_fields(f"/proc/{pid}/status", ('VmHWM',))['VmHWM'] / 1024, 1)
+    except (OSError, KeyError):
+        pass
+    try:
+        import resource
+        import sys
+        # Not resettable; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except (ImportError, OSError):
+        return None
+
+
+def child_pids(pid):
+    """Direct children of a process (Linux)"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", 'r') as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def worker_group_memory(parent_pid):
+    """Memory of a prefork parent and each of its workers, with the group's total PSS"""
+    workers = {}
+    for pid in child_pids(parent_pid):
+        memory = process_memory(pid)
+        if memory is not None:
+            workers[str(pid)] = memory
+
+    parent = process_memory(parent_pid)
+    members = list(workers.values()) + ([parent] if parent else [])
+    pss = [member['pss_mb'] for member in members if member.get('pss_mb') is not None]
+    return {
+        'parent_pid': parent_pid,
+        'parent': parent,
+        'workers': workers,
+        'total_pss_mb': round(sum(pss), 1) if len(pss) == len(members) else None,
+        'total_rss_mb': round(sum(member['rss_mb'] for member in members), 1),
+    }
+
+
+def format_memory(memory):
+    if memory is None:
+        return "n/a"
+    if memory.get('pss_mb') is None:
+        return f"RSS {memory['rss_mb']:.0f} MB"
+    return (f"RSS {memory['rss_mb']:.0f} MB, PSS {memory['pss_mb']:.0f} MB "
+            f"(shared {memory['shared_mb']:.0f} MB, private {memory['private_mb']:.0f} MB)")
@@ -0,0 +1,209 @@
+"""
+Opt-in profiling of single requests.
+
+A flagged request runs each stage's synchronous work through ``RequestProfile.run``,
+which profiles it with cProfile (and torch.profiler for model stages) on whatever
+thread executes it. The per-stage captures are merged into one pstats file plus
+a Chrome trace per torch stage, and a JSON summary.
+"""
+
+import contextlib
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROFILE_HEADER = "x-greenlens-profile"
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+ARTIFACT_NAME_PATTERN = re.compile(r'^[0-9a-f]{32}(\.[a-z_]+)?\.(json|pstats|trace\.json)$')
+_FALSE_VALUES = ('', '0', 'false', 'no', 'off')
+
+
+class RequestProfile:
+    """cProfile stats and torch.profiler traces of one request, collected across threads"""
+
+    def __init__(self, profile_id=None):
+        self.id = profile_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.notes = []  # caveats about how this capture differs from normal serving
+        self._stats = None
+        self._traces = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def run(self, stage, func, *args, torch_ops=False, **kwargs):
+        """Call ``func`` under cProfile, and torch.profiler when ``torch_ops``, on the current thread"""
+        torch_profile = contextlib.nullcontext()
+        if torch_ops:
+            try:
+                from torch.profiler import profile, ProfilerActivity
+                torch_profile = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            except ImportError:
+                pass
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with torch_profile as trace:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per interpreter; overlapping
+                # stages of the same request are then only timed
+                profiler = None
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                self._record(stage, profiler, trace, time.perf_counter() - started)
+
+    def _record(self, stage, profiler, trace, elapsed):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + elapsed * 1000.0
+            if profiler is not None:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+            if trace is not None:
+                self._traces.append((stage, trace))
+
+    def top_functions(self, limit=30):
+        """The hottest functions by cumulative time, as pstats prints them"""
+        if self._stats is None:
+            return ""
+        stream = io.StringIO()
+        self._stats.stream = stream
+        self._stats.sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def save(self, directory):
+        """Write the pstats file, Chrome traces and a JSON summary; returns their paths"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        with self._lock:
+            if self._stats is not None:
+                path = directory / f"{self.id}.pstats"
+                self._stats.dump_stats(str(path))
+                paths.append(path)
+            for stage, trace in self._traces:
+                path = directory / f"{self.id}.{stage}.trace.json"
+                if not path.exists():
+                    trace.export_chrome_trace(str(path))
+                    paths.append(path)
+
+            summary = {
+                'profile_id': self.id,
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'wall_time_ms': round((time.perf_counter() - self.started) * 1000.0, 3),
+                'stages_ms': {stage: round(ms, 3) for stage, ms in self.stages.items()},
+                'artifacts': [path.name for path in paths],
+                'notes': list(self.notes),
+                'top_functions': self.top_functions(),
+            }
+        path = directory / f"{self.id}.json"
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        paths.append(path)
+        return paths
+
+
+class RequestProfiler:
+    """Decides which requests get profiled and stores their artifacts
+
+    Profiling is off unless ``enabled``; when a ``token`` is configured the flag's
+    value must match it. Only one request is profiled at a time; torch.profiler is
+    process-wide, and a flagged request arriving meanwhile simply runs unprofiled.
+    """
+
+    def __init__(self, directory, enabled=False, token=None):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.token = token or None
+        self._busy = threading.Lock()
+        self._release_lock = threading.Lock()
+        self.captured = 0
+        self.skipped = 0
+
+    def authorized(self, headers, query_params):
+        """Whether the request asks for profiling (header or ?profile=) with acceptable credentials"""
+        if not self.enabled:
+            return False
+        value = headers.get(PROFILE_HEADER) or query_params.get('profile') or ''
+        if self.token:
+            return hmac.compare_digest(value.encode('utf-8'), self.token.encode('utf-8'))
+        return value.lower() not in _FALSE_VALUES
+
+    def can_view(self, headers, query_params):
+        """Whether stored profiles may be read; needs the token (as for capture) when one is set"""
+        if self.token:
+            return self.authorized(headers, query_params)
+        return self.enabled
+
+    def begin(self, headers, query_params):
+        """A RequestProfile for a flagged request, or None"""
+        if not self.authorized(headers, query_params):
+            return None
+        if not self._busy.acquire(blocking=False):
+            self.skipped += 1
+            print("⚠️  Another request is being profiled, serving this one unprofiled")
+            return None
+        return RequestProfile()
+
+    def finish(self, profile):
+        """Write a profile's artifacts and free the profiling slot; returns the file paths"""
+        try:
+            paths = profile.save(self.directory)
+            self.captured += 1
+            print(f"🔬 Saved profile {profile.id} ({', '.join(path.name for path in paths)})")
+            return paths
+        except Exception as e:
+            print(f"⚠️  Could not save profile {profile.id}: {e}")
+            return []
+        finally:
+            self._release(profile)
+
+    def discard(self, profile):
+        """Free the profiling slot without writing anything; a no-op once the profile was finished"""
+        self._release(profile)
+
+    def _release(self, profile):
+        with self._release_lock:
+            if not profile.closed:
+                profile.closed = True
+                self._busy.release()
+
+    def summary(self, profile_id):
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(self.directory / f"{profile_id}.json", 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def artifact_path(self, profile_id, name):
+        """Path of a stored artifact belonging to profile_id, or None"""
+        if not PROFILE_ID_PATTERN.match(profile_id) or not ARTIFACT_NAME_PATTERN.match(name):
+            return None
+        if not name.startswith(profile_id):
+            return None
+        path = self.directory / name
+        return path if os.path.isfile(path) else None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'captured': self.captured,
+            'skipped_busy': self.skipped,
+        }
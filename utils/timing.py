@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Record wall-clock durations of named startup phases"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            print(f"⏱️  {name}: {elapsed * 1000:.0f} ms")
+
+    def record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def report(self):
+        """Phase durations in milliseconds plus time since this module was imported"""
+        return {
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            'elapsed_since_import_ms': round((time.perf_counter() - self.started_at) * 1000, 1),
+        }
+
+
+# Process-wide timer for the startup path (imports, model load, services)
+startup_timer = PhaseTimer()